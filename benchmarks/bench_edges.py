@@ -0,0 +1,84 @@
+"""边缘检测与边缘可视化的微基准
+
+对比逐点Python循环的旧实现与数组化实现，并校验两者输出一致:
+
+    python benchmarks/bench_edges.py [--image samples/frame.jpg] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.edges import detect_edges, detect_edge_points, draw_edge_overlay
+
+
+def legacy_detect_edges(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, 100, 200)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    coordinates = []
+    for contour in contours:
+        for point in contour:
+            x, y = point[0]
+            coordinates.append({"x": int(x), "y": int(y)})
+    return coordinates
+
+
+def legacy_draw_edge_overlay(image, edges):
+    visualization = image.copy()
+    for edge in edges:
+        cv2.circle(visualization, (edge['x'], edge['y']), 2, (0, 255, 0), -1)
+    return visualization
+
+
+def best_time(func, repeat):
+    func()  # 预热
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='边缘检测/可视化微基准')
+    parser.add_argument('--image', default=os.path.join(ROOT, 'samples', 'frame.jpg'))
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    frame = cv2.imread(args.image)
+    if frame is None:
+        raise SystemExit(f"无法读取图片: {args.image}")
+    edges = legacy_detect_edges(frame)
+    points = detect_edge_points(frame)
+
+    assert detect_edges(frame) == edges, "detect_edges 输出与旧实现不一致"
+    assert np.array_equal(draw_edge_overlay(frame, edges), legacy_draw_edge_overlay(frame, edges)), \
+        "draw_edge_overlay 输出与旧实现不一致"
+
+    print(f"图片: {args.image} {frame.shape[1]}x{frame.shape[0]}, 边缘点: {len(edges)}")
+    # edge_points/overlay_array 为流水线内部使用的数组路径
+    print(f"{'stage':<16}{'legacy (ms)':>14}{'vectorized (ms)':>18}{'speedup':>10}")
+    cases = [
+        ('detect_edges', lambda: legacy_detect_edges(frame), lambda: detect_edges(frame)),
+        ('edge_points', lambda: legacy_detect_edges(frame), lambda: detect_edge_points(frame)),
+        ('edge_overlay', lambda: legacy_draw_edge_overlay(frame, edges), lambda: draw_edge_overlay(frame, edges)),
+        ('overlay_array', lambda: legacy_draw_edge_overlay(frame, edges), lambda: draw_edge_overlay(frame, points)),
+    ]
+    for name, legacy, vectorized in cases:
+        legacy_time = best_time(legacy, args.repeat)
+        vectorized_time = best_time(vectorized, args.repeat)
+        print(f"{name:<16}{legacy_time * 1000:>14.2f}{vectorized_time * 1000:>18.2f}"
+              f"{legacy_time / vectorized_time:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""多帧边缘检测的并行基准
+
+对比三种方式处理同一组帧的总耗时（包括进程池启动），并校验输出一致:
+- serial: 当前进程中逐帧 detect_edge_points
+- pool_pickle: 旧实现，每帧整帧pickle后提交到进程池
+- pool_shared: detect_edges_parallel，帧通过共享内存传给子进程
+
+    python benchmarks/bench_parallel_edges.py [--frames 24] [--workers 4] [--scale 1 2 4] [--repeat 3]
+
+单核机器上进程池没有加速效果，此时只能比较两种传输方式的开销。
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.edges import detect_edge_points, detect_edges_parallel
+
+
+def legacy_detect_edges_parallel(frames, workers):
+    """旧实现：整帧作为参数提交，经pickle和管道传给子进程"""
+    context = multiprocessing.get_context('spawn')
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        for frame_id, timestamp, frame in frames:
+            pending.append((frame_id, timestamp, frame, executor.submit(detect_edge_points, frame)))
+            if len(pending) >= workers * 2:
+                frame_id, timestamp, frame, future = pending.popleft()
+                yield frame_id, timestamp, frame, future.result()
+        while pending:
+            frame_id, timestamp, frame, future = pending.popleft()
+            yield frame_id, timestamp, frame, future.result()
+
+
+def serial(frames, workers):
+    for frame_id, timestamp, frame in frames:
+        yield frame_id, timestamp, frame, detect_edge_points(frame)
+
+
+def make_frames(frame, scale, count):
+    """由样例帧平铺放大，并逐帧平移，保证每帧内容不同"""
+    tiled = np.tile(frame, (scale, scale, 1))
+    return [(index, float(index), np.roll(tiled, index * 7, axis=1)) for index in range(count)]
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多帧边缘检测并行基准')
+    parser.add_argument('--image', default=os.path.join(ROOT, 'samples', 'frame.jpg'))
+    parser.add_argument('--frames', type=int, default=24)
+    parser.add_argument('--workers', type=int, default=None, help='进程数 (默认: CPU核数，至少2)')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 2, 4], help='样例帧的平铺倍数')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    frame = cv2.imread(args.image)
+    if frame is None:
+        raise SystemExit(f"无法读取图片: {args.image}")
+    workers = args.workers or max(2, multiprocessing.cpu_count())
+    print(f"CPU核数: {multiprocessing.cpu_count()}, 进程数: {workers}, 帧数: {args.frames}")
+    print(f"{'frame size':<14}{'MB/frame':>10}{'serial (s)':>12}{'pool_pickle (s)':>17}"
+          f"{'pool_shared (s)':>17}{'shared vs serial':>18}")
+
+    for scale in args.scale:
+        frames = make_frames(frame, scale, args.frames)
+        expected = [edges for _, _, _, edges in serial(frames, workers)]
+        timings = {}
+        for name, detect in (('serial', serial), ('pool_pickle', legacy_detect_edges_parallel),
+                             ('pool_shared', detect_edges_parallel)):
+            results = [edges for _, _, _, edges in detect(iter(frames), workers)]
+            assert all(np.array_equal(a, b) for a, b in zip(results, expected)), f"{name} 输出与逐帧检测不一致"
+            timings[name] = best_time(lambda: list(detect(iter(frames), workers)), args.repeat)
+        height, width = frames[0][2].shape[:2]
+        print(f"{f'{width}x{height}':<14}{frames[0][2].nbytes / 2 ** 20:>10.1f}{timings['serial']:>12.3f}"
+              f"{timings['pool_pickle']:>17.3f}{timings['pool_shared']:>17.3f}"
+              f"{timings['serial'] / timings['pool_shared']:>17.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""文本相似度后端基准
+
+比较各文本相似度方法的耗时以及与当前 difflib 得分的一致程度:
+- samples/ 中各策略页面与消融页面的比较（与 --mode evaluate 相同的组合）
+- 把样例页面放大到约 50KB、100KB 的合成页面（重复正文并加入大量 Tailwind 类名）
+
+    python benchmarks/bench_text_similarity.py [--sizes 50 100] [--difflib-limit 100]
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.document import ParsedDocument
+from utils.text_similarity import TextSimilarityEngine
+
+TAILWIND_CLASSES = ['flex', 'items-center', 'justify-between', 'px-4', 'py-2', 'mt-4', 'mb-2', 'rounded-lg',
+                    'shadow-md', 'bg-white', 'text-gray-700', 'hover:bg-gray-100', 'font-semibold', 'text-sm',
+                    'md:w-1/2', 'lg:w-1/3', 'grid', 'grid-cols-3', 'gap-4', 'border', 'border-gray-200']
+
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def scaled_html(html, kilobytes, seed):
+    """重复页面 body 中的内容直到约 kilobytes KB，每个块都带一串随机 Tailwind 类名"""
+    rng = random.Random(seed)
+    start = html.find('<body')
+    start = html.find('>', start) + 1
+    end = html.rfind('</body>')
+    head, body, tail = html[:start], html[start:end], html[end:]
+    blocks = []
+    size = len(head) + len(tail)
+    while size < kilobytes * 1024:
+        classes = ' '.join(rng.sample(TAILWIND_CLASSES, 8))
+        block = f'<div class="{classes}">{body}</div>\n'
+        blocks.append(block)
+        size += len(block)
+    return head + ''.join(blocks) + tail
+
+
+def timed(func, repeat, setup=lambda: ()):
+    """重复 repeat 次取最短耗时，setup 的结果作为参数传入且不计入耗时"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def compare(label, doc1, doc2, methods, skip, repeat):
+    row = {}
+    for method in methods:
+        if method in skip:
+            row[method] = (None, None)
+            continue
+        engine = TextSimilarityEngine(method)
+        # 每次重新解析（不计时），避免签名等派生特征的缓存影响计时
+        row[method] = timed(engine.compute, repeat,
+                            lambda: (ParsedDocument(doc1.html), ParsedDocument(doc2.html)))
+    baseline = row['difflib'][0]
+    print(f"\n{label}  ({len(doc1.html) // 1024}KB vs {len(doc2.html) // 1024}KB)")
+    print(f"{'method':>10}{'time (ms)':>12}{'score':>9}{'diff':>9}")
+    for method, (score, elapsed) in row.items():
+        if score is None:
+            print(f"{method:>10}{'skip':>12}")
+            continue
+        diff = f"{abs(score - baseline):>9.3f}" if baseline is not None else f"{'-':>9}"
+        print(f"{method:>10}{elapsed * 1000:>12.2f}{score:>9.3f}{diff}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文本相似度基准')
+    parser.add_argument('--samples', default=os.path.join(ROOT, 'samples'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100],
+                        help='合成页面大小（KB）')
+    parser.add_argument('--difflib-limit', type=int, default=100,
+                        help='超过该大小（KB）时跳过 difflib')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    methods = TextSimilarityEngine.METHODS
+    ablation = read(os.path.join(args.samples, 'ablation', 'index.html'))
+    versions = sorted(glob.glob(os.path.join(args.samples, 'html_versions', '*.html')))
+
+    sample_rows = {}
+    for path in versions:
+        name = os.path.splitext(os.path.basename(path))[0]
+        sample_rows[name] = compare(name, ParsedDocument(ablation), ParsedDocument(read(path)),
+                                    methods, (), args.repeat)
+
+    for size in args.sizes:
+        doc1 = ParsedDocument(scaled_html(ablation, size, 1))
+        doc2 = ParsedDocument(scaled_html(read(versions[0]), size, 2))
+        skip = ('difflib',) if size > args.difflib_limit else ()
+        compare(f"synthetic {size}KB", doc1, doc2, methods, skip, 1 if size >= 50 else args.repeat)
+
+    # 样例上与 difflib 的一致程度：平均绝对差，以及各策略排名是否相同
+    def ranking(method):
+        return sorted(sample_rows, key=lambda name: sample_rows[name][method][0], reverse=True)
+
+    print("\n与 difflib 的一致程度（samples）")
+    print(f"{'method':>10}{'mean |diff|':>13}{'same ranking':>14}")
+    for method in methods:
+        diffs = [abs(row[method][0] - row['difflib'][0]) for row in sample_rows.values()]
+        print(f"{method:>10}{sum(diffs) / len(diffs):>13.3f}{str(ranking(method) == ranking('difflib')):>14}")
+
+
+if __name__ == '__main__':
+    main()
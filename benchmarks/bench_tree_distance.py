@@ -0,0 +1,92 @@
+"""树编辑距离引擎基准
+
+用合成的HTML页面（约100、1k、10k个节点）比较精确算法与 pq-gram 近似算法的耗时，
+并给出近似得分与精确得分的差值:
+
+    python benchmarks/bench_tree_distance.py [--sizes 100 1000 10000] [--exact-limit 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from zss import simple_distance
+
+from utils.document import ParsedDocument
+from utils.tree_distance import TreeDistanceEngine, APTED
+
+BLOCK_TAGS = ['div', 'section', 'article', 'ul', 'nav', 'form']
+LEAF_TAGS = ['p', 'span', 'a', 'img', 'button', 'input', 'li', 'h3']
+
+
+def synthetic_html(nodes, seed):
+    """生成约 nodes 个元素的页面：卡片/列表等块级容器中嵌套若干叶子元素"""
+    rng = random.Random(seed)
+    parts = ['<!DOCTYPE html><html><head><title>bench</title></head><body>']
+    open_tags = []
+    count = 4  # html/head/title/body
+    while count < nodes:
+        if len(open_tags) < 6 and rng.random() < 0.3:
+            tag = rng.choice(BLOCK_TAGS)
+            parts.append(f'<{tag} class="c{rng.randint(0, 9)}">')
+            open_tags.append(tag)
+            count += 1
+        elif open_tags and rng.random() < 0.2:
+            parts.append(f'</{open_tags.pop()}>')
+        else:
+            tag = rng.choice(LEAF_TAGS)
+            parts.append(f'<{tag}>item {count}</{tag}>')
+            count += 1
+    parts.extend(f'</{tag}>' for tag in reversed(open_tags))
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='树编辑距离基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--exact-limit', type=int, default=1000,
+                        help='超过该节点数时跳过精确算法')
+    parser.add_argument('--zss-limit', type=int, default=100,
+                        help='超过该节点数时跳过 zss（Zhang-Shasha）')
+    args = parser.parse_args()
+
+    engine = TreeDistanceEngine('approximate')
+    exact_engine = TreeDistanceEngine('exact')
+    print(f"精确算法: {exact_engine.exact_algorithm}")
+    print(f"{'nodes':>7}{'parse (s)':>11}{'pq-gram (s)':>13}{'apted (s)':>11}{'zss (s)':>10}"
+          f"{'approx':>9}{'exact':>9}{'diff':>8}")
+    for size in args.sizes:
+        (doc1, doc2), parse_time = timed(lambda: (ParsedDocument(synthetic_html(size, 1)),
+                                                  ParsedDocument(synthetic_html(size, 2))))
+        approx, approx_time = timed(lambda: engine.compute(doc1.tree, doc2.tree,
+                                                           doc1.node_count, doc2.node_count))
+        exact = None
+        exact_time = zss_time = None
+        if APTED is not None and size <= args.exact_limit:
+            exact, exact_time = timed(lambda: exact_engine.compute(doc1.tree, doc2.tree,
+                                                                   doc1.node_count, doc2.node_count))
+        if size <= args.zss_limit:
+            _, zss_time = timed(lambda: simple_distance(doc1.tree, doc2.tree))
+
+        def fmt(value, width, digits=3):
+            return f"{value:>{width}.{digits}f}" if value is not None else f"{'skip':>{width}}"
+
+        print(f"{max(doc1.node_count, doc2.node_count):>7}{parse_time:>11.3f}{approx_time:>13.4f}"
+              f"{fmt(exact_time, 11)}{fmt(zss_time, 10)}{approx['score']:>9.3f}"
+              f"{fmt(exact and exact['score'], 9)}"
+              f"{fmt(exact and abs(approx['score'] - exact['score']), 8)}")
+
+
+if __name__ == '__main__':
+    main()
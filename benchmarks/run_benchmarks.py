@@ -0,0 +1,316 @@
+"""热点路径基准套件
+
+离线运行（不调用LLM），覆盖帧解码/采样、边缘检测、图片编码和HTML评估各阶段，
+输入为 samples/ 中的 frame.jpg、html_versions 页面以及由它们放大得到的合成帧/页面。
+每个阶段先预热再重复计时（记录最短与中位数），并在 tracemalloc 下额外运行一次记录峰值内存
+（仅统计Python/numpy分配，OpenCV内部缓冲区不计入）。
+
+与基线比较时使用各次重复中的最短耗时（受调度噪声影响最小）。某阶段的最短耗时超过基线 (1 + threshold) 倍，
+且超出量大于 min_delta_ms 和两次运行各自抖动（中位数 - 最短）的 noise_factor 倍时，判为退化。
+默认只报告；加 --gate 时有退化则退出码为1，且只在与基线相同的环境（平台、CPU核数、
+Python/numpy/OpenCV 版本、是否安装 apted）下生效:
+
+    python benchmarks/run_benchmarks.py                       # 与 benchmarks/baseline.json 比较并报告
+    python benchmarks/run_benchmarks.py --gate                # 同一环境下作为退化检查
+    python benchmarks/run_benchmarks.py --save-baseline       # 记录新的基线
+    python benchmarks/run_benchmarks.py --stages edge encode --threshold 0.3
+"""
+import argparse
+import glob
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from utils.dedup import FrameDeduplicator
+from utils.document import ParsedDocument
+from utils.edges import detect_edge_points, draw_edge_overlay
+from utils.encoder import ImageEncoder
+from utils.evaluate import HTMLEvaluator
+from utils.layout import LayoutExtractor
+from utils.webpage_handler import WebpageHandler
+from bench_text_similarity import scaled_html
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def tiled_frame(frame, factor):
+    """把样例帧平铺 factor×factor 次，得到更大的合成帧"""
+    return np.tile(frame, (factor, factor, 1))
+
+
+def synthetic_video(frame, path, seconds=3, fps=30):
+    """由样例帧生成一段带移动色块的视频，保证每帧内容不同"""
+    height, width = frame.shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for index in range(seconds * fps):
+        image = frame.copy()
+        x = (index * 13) % (width - 100)
+        cv2.rectangle(image, (x, 40), (x + 100, 140), (0, 0, 255), -1)
+        writer.write(image)
+    writer.release()
+
+
+def build_stages(samples, workdir):
+    """返回 [(分组, 阶段名, 函数)]"""
+    frame_path = os.path.join(samples, 'frame.jpg')
+    frame = cv2.imread(frame_path)
+    if frame is None:
+        raise SystemExit(f"无法读取图片: {frame_path}")
+    with open(frame_path, 'rb') as f:
+        jpeg_bytes = np.frombuffer(f.read(), np.uint8)
+    frame_4k = tiled_frame(frame, 4)
+    points = detect_edge_points(frame)
+    video_path = os.path.join(workdir, 'bench.mp4')
+    synthetic_video(frame, video_path)
+    # 只用到帧解码，不调用LLM
+    handler = WebpageHandler(llm_util=object())
+    handler.sample_rate = 0.5
+    deduplicator = FrameDeduplicator()
+    layout = LayoutExtractor()
+
+    ablation = read(os.path.join(samples, 'ablation', 'index.html'))
+    versions = [read(path) for path in sorted(glob.glob(os.path.join(samples, 'html_versions', '*.html')))]
+    synthetic_pair = (scaled_html(ablation, 20, 1), scaled_html(versions[0], 20, 2))
+    synthetic_large = (scaled_html(ablation, 100, 1), scaled_html(versions[0], 100, 2))
+    evaluator = HTMLEvaluator()
+    approx_evaluator = HTMLEvaluator(tree_mode='approximate', text_method='minhash')
+    docs = [ParsedDocument(html) for html in [ablation] + versions]
+
+    def pairs_with(metric):
+        return lambda: [metric(docs[0], doc) for doc in docs[1:]]
+
+    def fresh_encoder(**kwargs):
+        # cache_size=0：每次都真正编码
+        encoder = ImageEncoder(cache_size=0, **kwargs)
+        return encoder.encode_base64
+
+    encode_jpeg = fresh_encoder()
+    encode_webp = fresh_encoder(fmt='webp', quality=80)
+    encode_scaled = fresh_encoder(max_dim=1280)
+
+    return [
+        ('frame', 'frame_decode_jpeg', lambda: cv2.imdecode(jpeg_bytes, cv2.IMREAD_COLOR)),
+        ('frame', 'frame_extract_grab', lambda: handler.extract_frames(video_path, 'grab')),
+        ('frame', 'frame_extract_seek', lambda: handler.extract_frames(video_path, 'seek')),
+        ('frame', 'frame_dhash', lambda: deduplicator.hash_frame(frame)),
+        ('edge', 'edge_detect', lambda: detect_edge_points(frame)),
+        ('edge', 'edge_detect_4k', lambda: detect_edge_points(frame_4k)),
+        ('edge', 'edge_overlay', lambda: draw_edge_overlay(frame, points)),
+        ('edge', 'layout_extract', lambda: layout.extract(frame)),
+        ('encode', 'encode_jpeg_base64', lambda: encode_jpeg(frame)),
+        ('encode', 'encode_jpeg_base64_4k', lambda: encode_jpeg(frame_4k)),
+        ('encode', 'encode_webp_base64', lambda: encode_webp(frame)),
+        ('encode', 'encode_downscaled_4k', lambda: encode_scaled(frame_4k)),
+        ('evaluate', 'eval_parse_samples', lambda: [ParsedDocument(html) for html in [ablation] + versions]),
+        ('evaluate', 'eval_text_similarity', pairs_with(evaluator.calculate_text_similarity)),
+        ('evaluate', 'eval_tag_similarity', pairs_with(evaluator.calculate_tag_similarity)),
+        ('evaluate', 'eval_tree_distance', pairs_with(evaluator.calculate_tree_distance)),
+        ('evaluate', 'eval_vector_similarity', pairs_with(evaluator.calculate_vector_similarity)),
+        ('evaluate', 'eval_samples_full', lambda: [evaluator._compute_metrics(ParsedDocument(ablation),
+                                                                              ParsedDocument(html))
+                                                   for html in versions]),
+        ('evaluate', 'eval_synthetic_20kb', lambda: evaluator._compute_metrics(*map(ParsedDocument, synthetic_pair))),
+        ('evaluate', 'eval_synthetic_100kb_fast', lambda: approx_evaluator._compute_metrics(
+            *map(ParsedDocument, synthetic_large))),
+        ('evaluate', 'eval_many_samples', lambda: evaluator.evaluate_many(
+            [ParsedDocument(html) for html in [ablation] + versions])),
+    ]
+
+
+def measure(func, warmup, repeat):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'peak_kb': peak / 1024,
+        'repeat': repeat
+    }
+
+
+def package_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        # 决定精确树编辑距离使用 APTED 还是 zss 以及 auto 模式的节点数上限，影响评估阶段的耗时
+        'apted': package_version('apted')
+    }
+
+
+# 这些字段不同时计时不可直接比较
+COMPARABLE_FIELDS = ('platform', 'python', 'cpu_count', 'numpy', 'opencv', 'apted')
+
+
+def machine_differences(baseline_machine, machine):
+    """返回与基线环境不同的字段 [(字段, 基线值, 当前值)]"""
+    return [(field, baseline_machine.get(field), machine.get(field)) for field in COMPARABLE_FIELDS
+            if baseline_machine.get(field) != machine.get(field)]
+
+
+def compare(results, baseline, threshold, min_delta_ms, noise_factor=3.0):
+    """返回退化的阶段列表 [(阶段, 当前ms, 基线ms)]，按最短耗时比较
+
+    超出量需要同时大于 threshold 比例、min_delta_ms，以及两次运行中较大的抖动
+    （中位数 - 最短）的 noise_factor 倍，否则视为噪声
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('stages', {}).get(name)
+        if base is None:
+            continue
+        current, previous = result['min_ms'], base['min_ms']
+        noise_ms = max(result['median_ms'] - result['min_ms'], base['median_ms'] - base['min_ms'])
+        if current > previous * (1 + threshold) and current - previous > max(min_delta_ms, noise_factor * noise_ms):
+            regressions.append((name, current, previous))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='帧/边缘/编码/评估热点路径基准')
+    parser.add_argument('--samples', default=os.path.join(ROOT, 'samples'))
+    parser.add_argument('--stages', nargs='+', default=None,
+                        help='只运行名称或分组包含这些关键字的阶段')
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='把本次结果写入基线文件（只更新本次运行的阶段）')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='最短耗时超过基线的比例阈值 (默认: 0.25，即慢25%%判为退化)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='绝对差小于该值时不判为退化 (默认: 0.5ms)')
+    parser.add_argument('--noise-factor', type=float, default=3.0,
+                        help='绝对差还需大于抖动（中位数 - 最短）的该倍数 (默认: 3)')
+    parser.add_argument('--confirm', type=int, default=2,
+                        help='疑似退化的阶段重新计时的次数，取各次中的最短耗时 (默认: 2)')
+    parser.add_argument('--gate', action='store_true',
+                        help='有退化时退出码为1（仅在与基线相同的环境下生效）')
+    parser.add_argument('--output', default=None, help='把本次结果写入JSON文件')
+    parser.add_argument('--list', action='store_true', help='只列出阶段')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        stages = build_stages(args.samples, workdir)
+        if args.stages:
+            stages = [stage for stage in stages
+                      if any(keyword in stage[0] or keyword in stage[1] for keyword in args.stages)]
+        if args.list:
+            for group, name, _ in stages:
+                print(f"{group:<10}{name}")
+            return
+
+        baseline = {}
+        differences = []
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            baseline_machine = baseline.get('machine', {})
+            differences = machine_differences(baseline_machine, machine_info())
+            if differences:
+                print("注意: 基线记录于其它环境，比较结果仅供参考:")
+                for field, previous, current in differences:
+                    print(f"  {field}: {previous} -> {current}")
+            if (baseline_machine.get('cpu_count') or 0) <= 1:
+                print("注意: 基线记录于单核环境，计时受其它进程干扰较大")
+
+        print(f"{'stage':<28}{'min (ms)':>10}{'median (ms)':>13}{'peak (KB)':>11}{'baseline':>10}{'change':>9}")
+        results = {}
+        for group, name, func in stages:
+            result = measure(func, args.warmup, args.repeat)
+            result['group'] = group
+            results[name] = result
+            base = baseline.get('stages', {}).get(name)
+            change = f"{result['min_ms'] / base['min_ms'] - 1:>+9.0%}" if base else f"{'-':>9}"
+            base_text = f"{base['min_ms']:>10.2f}" if base else f"{'-':>10}"
+            print(f"{name:<28}{result['min_ms']:>10.2f}{result['median_ms']:>13.2f}"
+                  f"{result['peak_kb']:>11.0f}{base_text}{change}")
+
+        # 运行之间的漂移（CPU频率、其它进程）不体现在单次运行的抖动中，疑似退化的阶段重新计时确认
+        functions = {name: func for _, name, func in stages}
+        for _ in range(args.confirm if baseline else 0):
+            suspects = compare(results, baseline, args.threshold, args.min_delta_ms, args.noise_factor)
+            if not suspects:
+                break
+            for name, _, _ in suspects:
+                rerun = measure(functions[name], args.warmup, args.repeat)
+                if rerun['min_ms'] < results[name]['min_ms']:
+                    rerun['group'] = results[name]['group']
+                    results[name] = rerun
+                print(f"复测 {name}: 最短 {rerun['min_ms']:.2f}ms")
+
+    report = {'machine': machine_info(), 'timestamp': time.time(), 'stages': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        merged = dict(baseline.get('stages', {}))
+        merged.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': report['machine'], 'timestamp': report['timestamp'], 'stages': merged},
+                      f, indent=2)
+        print(f"\n基线已保存至: {args.baseline}")
+        return
+
+    if not baseline:
+        print(f"\n未找到基线 {args.baseline}，使用 --save-baseline 记录")
+        return
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms, args.noise_factor)
+    if not regressions:
+        print(f"\n所有阶段均在基线 {args.threshold:.0%} 以内（或在噪声范围内）")
+        return
+    print(f"\n{len(regressions)} 个阶段慢于基线 {args.threshold:.0%} 以上且超出噪声范围:")
+    for name, current, previous in regressions:
+        print(f"  {name}: {previous:.2f}ms -> {current:.2f}ms")
+    if not args.gate:
+        return
+    if differences:
+        print("环境与基线不同，不作为退化检查（请在本环境下用 --save-baseline 重新记录基线）")
+        return
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
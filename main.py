@@ -1,8 +1,15 @@
 import argparse
-from webpage_handler import WebpageHandler
+# 较重的模块（cv2、sklearn、bs4、zss 等）在各模式真正用到时才导入，
+# evaluate/corpus 模式不会加载 OpenCV 和 WebpageHandler
+from utils.tracing import tracer
+from utils.metrics import registry, EVALUATION_DURATION, OUTPUT_BYTES
+from utils.startup_profile import import_profiler
 from pathlib import Path
 import os
 import json
+import queue
+import signal
+import time
 from datetime import datetime
 
 DEFAULT_VIDEO_PATH = os.path.join(os.getcwd(),'ui_dataset','VID_20241114_153252.mp4')
@@ -16,28 +23,148 @@ def parse_args():
                       help='输出目录路径 (默认: output)')
     parser.add_argument('--sample-rate', '-s', type=float, default=5.0,
                       help='视频采样率，单位为秒 (默认: 5.0)')
-    parser.add_argument('--mode', '-m', type=str, choices=['full', 'ablation', 'both','evaluate'],
-                      default='evaluate', help='运行模式: full(完整分析), ablation(消融实验), both(两者都运行) (默认: both)')
+    parser.add_argument('--sampling', type=str, choices=['grab', 'seek', 'read'], default='grab',
+                      help='帧采样方式: grab(只把采样帧转换为BGR), seek(按位置跳转), read(每帧都转换为BGR) (默认: grab)')
+    parser.add_argument('--multi-frame', action='store_true',
+                      help='分析视频的所有采样帧，而不是只分析第一帧')
+    parser.add_argument('--workers', '-j', type=int, default=None,
+                      help='多帧模式下边缘检测的进程数 (默认: CPU核数)')
+    parser.add_argument('--dedup-threshold', type=int, default=5,
+                      help='多帧模式下近重复帧的感知哈希距离阈值(0-64)，负数表示不去重 (默认: 5)')
+    parser.add_argument('--max-dim', type=int, default=None,
+                      help='视觉调用前将图片最长边缩放到该像素数 (默认: 不缩放)')
+    parser.add_argument('--image-quality', type=int, default=95,
+                      help='视觉调用图片的jpg/webp质量 (默认: 95)')
+    parser.add_argument('--image-format', type=str, choices=['jpg', 'webp', 'png'], default='jpg',
+                      help='视觉调用图片的编码格式 (默认: jpg)')
+    parser.add_argument('--llm-concurrency', type=int, default=3,
+                      help='同时进行的LLM调用数上限 (默认: 3)')
+    parser.add_argument('--llm-timeout', type=float, default=None,
+                      help='单个LLM调用的超时秒数 (默认: 不限制)')
+    parser.add_argument('--cache-dir', type=str, default=os.path.join('.cache', 'llm'),
+                      help='LLM/视觉响应缓存目录 (默认: .cache/llm)')
+    parser.add_argument('--cache-max-mb', type=float, default=512,
+                      help='响应缓存大小上限，超出时按LRU淘汰 (默认: 512MB)')
+    parser.add_argument('--cache-ttl', type=float, default=7 * 24,
+                      help='响应缓存有效期，单位小时 (默认: 168)')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='不使用响应缓存')
+    parser.add_argument('--refresh-cache', action='store_true',
+                      help='忽略已有缓存重新请求，并写入新结果')
+    parser.add_argument('--llm-backend', type=str, choices=['llmutil', 'http', 'mock'], default='llmutil',
+                      help='LLM后端: llmutil(原有LLMUtil), http(OpenAI兼容接口), mock(本地模拟服务) (默认: llmutil)')
+    parser.add_argument('--llm-base-url', type=str, default=os.environ.get('LLM_BASE_URL'),
+                      help='http 后端的接口地址 (默认: 环境变量 LLM_BASE_URL)')
+    parser.add_argument('--llm-model', type=str, default=os.environ.get('LLM_MODEL'),
+                      help='http 后端使用的模型 (默认: 环境变量 LLM_MODEL)')
+    parser.add_argument('--rpm', type=float, default=None,
+                      help='每分钟最多请求数 (默认: 不限制)')
+    parser.add_argument('--tpm', type=float, default=None,
+                      help='每分钟最多token数（按提示词长度估算） (默认: 不限制)')
+    parser.add_argument('--llm-retries', type=int, default=4,
+                      help='遇到429/5xx时的最大重试次数 (默认: 4)')
+    parser.add_argument('--stream', action='store_true',
+                      help='流式接收LLM输出并实时写入HTML文件，记录各策略的首token延迟和生成速度')
+    parser.add_argument('--tree-mode', type=str, choices=['auto', 'exact', 'approximate'], default='auto',
+                      help='树编辑距离: exact(精确), approximate(pq-gram近似), auto(按节点数自动选择) (默认: auto)')
+    parser.add_argument('--tree-cutoff', type=int, default=None,
+                      help='auto 模式下使用精确算法的最大节点数 (默认: 安装了 apted 时为500，否则为100)')
+    parser.add_argument('--text-similarity', type=str, choices=['difflib', 'bounded', 'jaccard', 'minhash', 'lcs'],
+                      default='difflib',
+                      help='文本相似度: difflib(原始字符级), bounded(大页面按标签片段比较), jaccard/minhash(字符shingle), lcs(可见文本词元LCS) (默认: difflib)')
+    parser.add_argument('--jobs', type=int, default=None,
+                      help='evaluate 模式下并行评估的进程数 (默认: 1, 不并行)')
+    parser.add_argument('--pairwise', action='store_true',
+                      help='evaluate 模式下额外计算所有页面两两之间的相似度矩阵（共用一次TF-IDF拟合），写入 similarity_matrix.json')
+    parser.add_argument('--metrics-cache-dir', type=str, default=os.path.join('.cache', 'metrics'),
+                      help='评估指标缓存目录，按HTML内容哈希缓存，只有新增或修改的文件会重新计算 (默认: .cache/metrics)')
+    parser.add_argument('--no-metrics-cache', action='store_true',
+                      help='不使用评估指标缓存')
+    parser.add_argument('--weights', type=str, nargs='+', default=None, metavar='METRIC=WEIGHT',
+                      help='评估指标权重，如 text_similarity=0.4 tree_distance=0.2（未指定的保持0.25）')
+    parser.add_argument('--corpus-results', type=str, default=None,
+                      help='corpus 模式的逐对结果文件 (默认: <output>/evaluation_results.jsonl)')
+    parser.add_argument('--trace', type=str, nargs='?', const='', default=None, metavar='PATH',
+                      help='记录各阶段耗时（墙钟/CPU时间、字节数、线程），导出Chrome/Perfetto trace文件并打印汇总 (默认路径: <output>/trace.json)')
+    parser.add_argument('--metrics-textfile', type=str, default=None, metavar='PATH',
+                      help='运行结束时把Prometheus指标写入该文件（供 node_exporter textfile collector 读取）')
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                      help='运行期间在该端口的 /metrics 提供Prometheus指标（仅监听 127.0.0.1）')
+    parser.add_argument('--startup-profile', type=str, nargs='?', const='', default=None, metavar='PATH',
+                      help='打印各模块的导入耗时和峰值内存，指定路径时把全部模块的明细写入JSON')
+    parser.add_argument('--spool-dir', type=str, default='spool',
+                      help='worker 模式的任务目录，任务放在 incoming/ 下，状态写入 status/ (默认: spool)')
+    parser.add_argument('--worker-port', type=int, default=None, metavar='PORT',
+                      help='worker 模式下在该端口提供任务提交/查询接口 POST /jobs, GET /jobs/<id>（仅监听 127.0.0.1）')
+    parser.add_argument('--max-jobs', type=int, default=2,
+                      help='worker 模式下同时运行的任务数上限 (默认: 2)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                      help='worker 模式下检查新任务的间隔秒数 (默认: 1.0)')
+    parser.add_argument('--drain', action='store_true',
+                      help='worker 模式下处理完 spool 中的所有任务后退出')
+    parser.add_argument('--mode', '-m', type=str, choices=['full', 'ablation', 'both', 'evaluate', 'corpus', 'worker'],
+                      default='evaluate', help='运行模式: full(完整分析), ablation(消融实验), both(两者都运行), evaluate(评估), corpus(批量评估 --output 下的所有运行目录), worker(常驻进程，从 --spool-dir 领取任务) (默认: evaluate)')
     return parser.parse_args()
 
-def run_full_analysis(handler, video_path, output_dir):
+def print_extract_stats(stats):
+    """打印帧采样统计"""
+    print("\n=== 帧采样统计 ===")
+    print(f"采样方式: {stats['sampling']} (每 {stats['frame_interval']} 帧取一帧)")
+    if 'sampled_reads' in stats:
+        print(f"定位读取次数: {stats['sampled_reads']} (定位时从关键帧开始的解码不计入)")
+    else:
+        print(f"读取帧数: {stats['frames_grabbed']}")
+    print(f"转换帧数: {stats['frames_retrieved']}")
+    print(f"保留帧数: {stats['frames_kept']}")
+
+def print_encode_stats(encoder):
+    """打印图片编码统计"""
+    print("\n=== 图片编码统计 ===")
+    for index, stat in enumerate(encoder.stats, 1):
+        source = "缓存" if stat['cached'] else "编码"
+        print(f"#{index} {stat['format']} {stat['width']}x{stat['height']}: "
+              f"{stat['bytes']} 字节 (base64 {stat['base64_bytes']}), "
+              f"{stat['encode_ms']:.1f} ms [{source}]")
+    summary = encoder.summary()
+    print(f"共 {summary['calls']} 次, 缓存命中 {summary['cache_hits']} 次, "
+          f"{summary['bytes']} 字节, {summary['encode_ms']:.1f} ms")
+
+def print_stream_stats(stream_stats):
+    """打印各策略的流式生成延迟"""
+    print("\n=== 流式生成统计 ===")
+    for approach, stats in stream_stats.items():
+        speed = f"{stats['tokens_per_sec']:.1f} tokens/s" if stats['tokens_per_sec'] else "-"
+        print(f"- {approach}: 首token {stats['ttft_ms']:.0f} ms, 总耗时 {stats['total_ms']:.0f} ms, "
+              f"{stats['tokens']} tokens, {speed}")
+
+def run_full_analysis(handler, video_path, output_dir, context=None):
     """运行完整分析"""
     print("\n=== 运行完整分析（边缘检测 + 视觉分析）===")
-    result = handler.run(str(video_path), output_dir)
+    result = handler.run(str(video_path), output_dir, context=context)
     
     print("处理完成!")
+    print(f"分析帧数: {result['frame_count']}")
+    dedup_stats = result['dedup_stats']
+    if dedup_stats:
+        print(f"去重: {dedup_stats['unique_frames']}/{dedup_stats['frames']} 帧需要分析, "
+              f"去重率 {dedup_stats['dedup_ratio']:.1%} (阈值 {dedup_stats['threshold']})")
     print(f"原始帧保存至: {result['frame_path']}")
     print(f"JSON数据保存至: {result['json_path']}")
+    print(f"边缘数据保存至: {result['edges_path']}")
     print("\n各版本可视化:")
     for approach, path in result['html_paths'].items():
+        if approach == 'errors':
+            continue
         print(f"- {approach}: {path}")
+    for approach, error in result['html_paths'].get('errors', {}).items():
+        print(f"- {approach}: 生成失败 ({error})")
     
     return result
 
-def run_ablation_study(handler, video_path, output_dir):
+def run_ablation_study(handler, video_path, output_dir, context=None):
     """运行消融实验"""
     print("\n=== 运行消融实验（仅视觉分析）===")
-    result = handler.run_ablation(str(video_path), output_dir)
+    result = handler.run_ablation(str(video_path), output_dir, context=context)
     
     print("处理完成!")
     print(f"原始帧保存至: {result['frame_path']}")
@@ -48,41 +175,55 @@ def run_ablation_study(handler, video_path, output_dir):
 
 
 
-def run_evaluate(handler, output_dir):
+def run_evaluate(evaluator, output_dir, jobs=None):
     """评估不同方法生成的HTML结果差异"""
     print("\n=== 评估分析结果 ===")
     
-    # 获取html_versions目录下的所有HTML文件
+    # 获取html_versions目录下的所有HTML文件（按文件名排序，保证结果顺序确定）
     html_versions_dir = os.path.join(output_dir, 'html_versions')
-    html_files = [f for f in os.listdir(html_versions_dir) if f.endswith('.html')]
+    html_files = sorted(f for f in os.listdir(html_versions_dir) if f.endswith('.html'))
     
     if not html_files:
         raise Exception("未找到HTML文件在目录: " + html_versions_dir)
     
-    # 读取所有HTML文件
-    html_contents = {}
-    for filename in html_files:
-        file_path = os.path.join(html_versions_dir, filename)
-        with open(file_path, 'r', encoding='utf-8') as f:
-            html_contents[filename] = {
-                'path': file_path,
-                'content': f.read()
-            }
-    
     # 获取消融实验的HTML文件
     ablation_html_path = os.path.join(output_dir, 'ablation/index.html')
     with open(ablation_html_path, 'r', encoding='utf-8') as f:
         ablation_html = f.read()
     
+    # 读取所有HTML文件，读取失败的文件记录错误后跳过
+    html_contents = {}
+    errors = {}
+    for filename in html_files:
+        file_path = os.path.join(html_versions_dir, filename)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                html_contents[filename] = {
+                    'path': file_path,
+                    'content': f.read()
+                }
+        except (OSError, UnicodeDecodeError) as e:
+            errors[filename] = str(e)
+    
     # 创建评估结果目录
     eval_output_dir = os.path.join(output_dir, 'evaluation_results')
     os.makedirs(eval_output_dir, exist_ok=True)
     
-    # 对每个HTML版本进行评估
+    # 对每个HTML版本进行评估（--jobs > 1 时在进程池中并行）
+    if jobs and jobs > 1:
+        print(f"并行评估: {jobs} 个进程")
+    pairs = [(ablation_html, html_data['content']) for html_data in html_contents.values()]
+    start = time.perf_counter()
+    results = evaluator.generate_reports(pairs, jobs=jobs)
+    EVALUATION_DURATION.labels(metric='total').observe(time.perf_counter() - start)
+    
     reports = {}
-    for filename, html_data in html_contents.items():
+    for (filename, html_data), report in zip(html_contents.items(), results):
         print(f"\n评估 {filename} vs ablation:")
-        report = handler.run_evaluate(ablation_html, html_data['content'])
+        if isinstance(report, Exception):
+            errors[filename] = f"{type(report).__name__}: {report}"
+            print(f"评估失败: {errors[filename]}")
+            continue
         
         # 添加文件信息
         report['file_info'] = {
@@ -95,6 +236,7 @@ def run_evaluate(handler, output_dir):
         eval_path = os.path.join(eval_output_dir, eval_filename)
         with open(eval_path, 'w', encoding='utf-8') as f:
             json.dump(report, f, indent=2, ensure_ascii=False)
+        OUTPUT_BYTES.labels(kind='evaluation').inc(os.path.getsize(eval_path))
         
         reports[filename] = report
         
@@ -120,21 +262,316 @@ def run_evaluate(handler, output_dir):
         json.dump({
             'timestamp': datetime.now().isoformat(),
             'ablation_file': ablation_html_path,
-            'evaluations': reports
+            'evaluations': reports,
+            'errors': errors
         }, f, indent=2, ensure_ascii=False)
+    OUTPUT_BYTES.labels(kind='evaluation').inc(os.path.getsize(summary_path))
     
+    if errors:
+        print(f"\n{len(errors)} 个文件评估失败:")
+        for filename, error in errors.items():
+            print(f"  {filename}: {error}")
     print(f"\n汇总报告已保存至: {summary_path}")
     
     return reports
 
 
+def run_pairwise(evaluator, output_dir):
+    """计算消融页面与所有策略页面两两之间的相似度矩阵，写入一个矩阵文件"""
+    print("\n=== 两两相似度矩阵 ===")
+    html_versions_dir = os.path.join(output_dir, 'html_versions')
+    paths = [os.path.join(output_dir, 'ablation/index.html')]
+    paths += sorted(os.path.join(html_versions_dir, f) for f in os.listdir(html_versions_dir) if f.endswith('.html'))
+    htmls = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            htmls[os.path.relpath(path, output_dir)] = f.read()
+    
+    start = time.perf_counter()
+    result = evaluator.evaluate_many(htmls)
+    elapsed = time.perf_counter() - start
     
+    eval_output_dir = os.path.join(output_dir, 'evaluation_results')
+    os.makedirs(eval_output_dir, exist_ok=True)
+    matrix_path = os.path.join(eval_output_dir, 'similarity_matrix.json')
+    with open(matrix_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'names': result['names'],
+            'metrics': {metric: matrix.round(6).tolist() for metric, matrix in result['metrics'].items()},
+            'overall_score': result['overall_score'].round(6).tolist(),
+            'weights_used': evaluator.weights,
+            'tree_distance_methods': result['tree_distance_methods'],
+            'text_similarity_method': result['text_similarity_method']
+        }, f, indent=2, ensure_ascii=False)
+    
+    names = result['names']
+    width = max(len(name) for name in names)
+    print(f"{len(names)} 个文档, 用时 {elapsed:.2f}s, overall_score:")
+    for name, row in zip(names, result['overall_score']):
+        print(f"  {name:<{width}}  " + ' '.join(f"{value:.3f}" for value in row))
+    print(f"相似度矩阵已保存至: {matrix_path}")
+    return matrix_path
+
+
+    
+
+
+
+def run_corpus_evaluate(evaluator, root, results_path=None, jobs=None):
+    """评估根目录下所有运行目录，逐对写入JSONL，可中断后续跑"""
+    from utils.corpus_eval import CorpusEvaluation
+    print(f"\n=== 批量评估: {root} ===")
+    corpus = CorpusEvaluation(evaluator, root, results_path, jobs=jobs)
+    print(f"结果文件: {corpus.results_path}")
+    start = time.perf_counter()
+    stats = corpus.run()
+    EVALUATION_DURATION.labels(metric='total').observe(time.perf_counter() - start)
+    print(f"完成: 新评估 {stats['evaluated']} 对, 失败 {stats['failed']} 对, "
+          f"跳过已有结果 {stats['skipped']} 对, 用时 {time.perf_counter() - start:.1f}s")
+    
+    summary = corpus.summarize()
+    print(f"\n共 {summary['pairs']} 对, 各策略 overall_score:")
+    print(f"{'strategy':<40}{'count':>7}{'failed':>8}{'mean':>8}{'p50':>8}{'p90':>8}{'p95':>8}")
+    for strategy, info in summary['strategies'].items():
+        overall = info['scores'].get('overall_score')
+        row = (f"{overall['mean']:>8.3f}{overall['p50']:>8.3f}{overall['p90']:>8.3f}{overall['p95']:>8.3f}"
+               if overall else '')
+        print(f"{strategy:<40}{info['count']:>7}{info['failed']:>8}{row}")
+    print(f"\n汇总报告已保存至: {corpus.summary_path}")
+    return summary
+
+
+def build_evaluator(args):
+    """按命令行参数创建评估器"""
+    from utils.evaluate import HTMLEvaluator
+    from utils.response_cache import ResponseCache
+    metrics_cache = None
+    if not args.no_metrics_cache:
+        # 指标只取决于HTML内容和配置，不设过期时间
+        metrics_cache = ResponseCache(args.metrics_cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                                      ttl=None, refresh=args.refresh_cache, name='metrics')
+    evaluator = HTMLEvaluator(tree_mode=args.tree_mode, tree_cutoff=args.tree_cutoff,
+                              text_method=args.text_similarity, metrics_cache=metrics_cache)
+    for item in args.weights or []:
+        metric, _, weight = item.partition('=')
+        if metric not in evaluator.weights:
+            raise ValueError(f"未知的评估指标: {metric} (可选: {', '.join(evaluator.weights)})")
+        evaluator.weights[metric] = float(weight)
+    return evaluator
+
+
+def print_metrics_cache_stats(evaluator):
+    """打印评估指标缓存的命中情况"""
+    cache = evaluator.metrics_cache
+    if cache is not None and cache.hits + cache.misses:
+        print(f"\n指标缓存: 命中 {cache.hits} 对, 重新计算 {cache.misses} 对 ({cache.cache_dir})")
+
+
+def finish_trace(args):
+    """导出追踪文件并打印各区间汇总"""
+    if args.trace is None:
+        return
+    tracer.print_summary()
+    trace_path = tracer.export_chrome(args.trace or os.path.join(args.output, 'trace.json'))
+    print(f"追踪文件已保存至: {trace_path} (用 chrome://tracing 或 https://ui.perfetto.dev 打开)")
+
 
+def start_metrics(args):
+    """按需启动 /metrics 端口"""
+    if args.metrics_port is not None:
+        port = registry.serve(args.metrics_port)
+        print(f"Prometheus指标: http://127.0.0.1:{port}/metrics")
+
+
+def finish_metrics(args, quiet=False):
+    """写出指标文本文件（worker 模式下每个任务结束后都会更新）"""
+    if args.metrics_textfile:
+        registry.write_textfile(args.metrics_textfile)
+        if not quiet:
+            print(f"指标文件已保存至: {args.metrics_textfile}")
+
+
+def build_llm(args):
+    """创建LLM客户端，按需包装响应缓存，返回 (客户端, 响应缓存, 处理器使用的LLM)"""
+    from utils.llm_client import create_llm_client
+    from utils.response_cache import ResponseCache, CachedLLMUtil
+    llm_client = create_llm_client(args.llm_backend, base_url=args.llm_base_url, model=args.llm_model,
+                                   api_key=os.environ.get('LLM_API_KEY'), rpm=args.rpm, tpm=args.tpm,
+                                   max_retries=args.llm_retries)
+    response_cache = None
+    if not args.no_cache:
+        response_cache = ResponseCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                                       ttl=args.cache_ttl * 3600, refresh=args.refresh_cache)
+        llm = CachedLLMUtil(llm_client, response_cache)
+    else:
+        llm = llm_client
+    return llm_client, response_cache, llm
+
+
+def build_handler(args, llm, evaluator):
+    """按命令行参数创建处理器"""
+    from utils.encoder import ImageEncoder
+    from utils.webpage_handler import WebpageHandler
+    handler = WebpageHandler(llm)
+    handler.sample_rate = args.sample_rate
+    handler.sampling = args.sampling
+    handler.multi_frame = args.multi_frame
+    handler.workers = args.workers
+    handler.dedup_threshold = args.dedup_threshold if args.dedup_threshold >= 0 else None
+    handler.llm_concurrency = args.llm_concurrency
+    handler.llm_timeout = args.llm_timeout
+    handler.stream = args.stream
+    handler.preprocessor.concurrency = args.llm_concurrency
+    handler.preprocessor.timeout = args.llm_timeout
+    handler.eval_jobs = args.jobs
+    handler.evaluator = evaluator
+    handler.preprocessor.encoder = ImageEncoder(max_dim=args.max_dim, quality=args.image_quality,
+                                                fmt=args.image_format)
+    return handler
+
+
+def run_job(handler, video_path, output_dir, mode, pairwise=False):
+    """按模式运行一次分析/评估，返回各阶段的结果"""
+    if mode == 'evaluate':
+        return run_evaluate_mode(handler.evaluator, output_dir, handler.eval_jobs, pairwise)
+    
+    from utils.run_context import RunContext
+    results = {}
+    # full 与 ablation 共享第一帧的解码结果和直接分析
+    context = RunContext(str(video_path), handler.preprocessor)
+    
+    # 根据模式运行相应的分析
+    if mode in ['full', 'both']:
+        with tracer.span('mode.full', 'run'):
+            results['full'] = run_full_analysis(handler, video_path, output_dir, context)
+        
+    if mode in ['ablation', 'both']:
+        ablation_output = os.path.join(output_dir, 'ablation')
+        with tracer.span('mode.ablation', 'run'):
+            results['ablation'] = run_ablation_study(handler, video_path, ablation_output, context)
+    return results
+
+
+def run_evaluate_mode(evaluator, output_dir, jobs=None, pairwise=False):
+    """评估 output_dir 中已生成的HTML，按需计算两两相似度矩阵"""
+    results = {}
+    with tracer.span('mode.evaluate', 'run'):
+        results['evaluate'] = run_evaluate(evaluator, output_dir, jobs)
+    if pairwise:
+        with tracer.span('mode.pairwise', 'run'):
+            results['pairwise'] = run_pairwise(evaluator, output_dir)
+    return results
+
+
+def summarize_job(results):
+    """任务状态文件中记录的结果摘要（输出文件路径与总分）"""
+    summary = {}
+    if 'full' in results:
+        summary['full'] = {
+            'json_path': results['full']['json_path'],
+            'html_paths': results['full']['html_paths'],
+            'frame_count': results['full']['frame_count']
+        }
+    if 'ablation' in results:
+        summary['ablation'] = {'html_path': results['ablation']['html_path']}
+    if 'evaluate' in results:
+        summary['evaluate'] = {filename: report['overall_score'] for filename, report in results['evaluate'].items()}
+    if 'pairwise' in results:
+        summary['pairwise'] = results['pairwise']
+    return summary
+
+
+def run_worker(args):
+    """常驻 worker：启动时加载一次模型与客户端，之后从 spool 目录/HTTP接口领取任务"""
+    from utils.job_worker import JobWorker
+    llm_client, response_cache, llm = build_llm(args)
+    evaluator = build_evaluator(args)
+    # 每个并发任务使用独立的处理器（各自的统计与编码器），共享LLM客户端、缓存和评估器
+    handlers = queue.Queue()
+    for _ in range(max(1, args.max_jobs)):
+        handlers.put(build_handler(args, llm, evaluator))
+    
+    def runner(job):
+        if job['mode'] != 'evaluate' and not os.path.exists(job['video']):
+            raise FileNotFoundError(f"视频文件 '{job['video']}' 不存在")
+        handler = handlers.get()
+        try:
+            handler.reset_stats()
+            return summarize_job(run_job(handler, job['video'], job['output'], job['mode'], args.pairwise))
+        finally:
+            handlers.put(handler)
+    
+    worker = JobWorker(runner, args.spool_dir, max_jobs=args.max_jobs, poll_interval=args.poll_interval,
+                       on_job_finished=lambda status: finish_metrics(args, quiet=True))
+    if args.worker_port is not None:
+        port = worker.serve(args.worker_port)
+        print(f"任务接口: http://127.0.0.1:{port}/jobs")
+    # Ctrl+C / SIGTERM 时不再领取新任务，等待运行中的任务完成后退出
+    def stop(signum, frame):
+        print("\n收到退出信号，等待运行中的任务完成...")
+        worker.stop()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Worker 已启动: spool={os.path.abspath(args.spool_dir)}, 最多同时运行 {worker.max_jobs} 个任务")
+    try:
+        stats = worker.run(drain=args.drain)
+    finally:
+        worker.close()
+        llm_client.close()
+    print(f"Worker 退出: 完成 {stats['done']} 个任务, 失败 {stats['failed']} 个")
+    print_metrics_cache_stats(evaluator)
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        print(f"\n响应缓存: 命中 {cache_stats['hits']} 次, 未命中 {cache_stats['misses']} 次 "
+              f"({response_cache.cache_dir})")
+
+
+def finish_startup_profile(args):
+    """打印各模块导入耗时，指定路径时写出全部模块的明细"""
+    if args.startup_profile is None:
+        return
+    import_profiler.print_summary()
+    if args.startup_profile:
+        print(f"导入耗时明细已保存至: {import_profiler.export_json(args.startup_profile)}")
 
 
 def main():
     """主函数"""
     args = parse_args()
+    if args.startup_profile is not None:
+        import_profiler.install()
+    if args.trace is not None:
+        tracer.enable()
+    start_metrics(args)
+    try:
+        run_mode(args)
+    finally:
+        finish_trace(args)
+        finish_metrics(args)
+        finish_startup_profile(args)
+
+
+def run_mode(args):
+    """按 --mode 运行，各模式只导入自己需要的模块"""
+    # 批量评估只读取HTML，不需要视频和LLM
+    if args.mode == 'corpus':
+        evaluator = build_evaluator(args)
+        with tracer.span('mode.corpus', 'run'):
+            run_corpus_evaluate(evaluator, args.output, args.corpus_results, args.jobs)
+        print_metrics_cache_stats(evaluator)
+        return
+    
+    # 评估只读取 --output 下已生成的HTML，不需要视频、LLM和OpenCV
+    if args.mode == 'evaluate':
+        evaluator = build_evaluator(args)
+        run_evaluate_mode(evaluator, args.output, args.jobs, args.pairwise)
+        print_metrics_cache_stats(evaluator)
+        return
+    
+    if args.mode == 'worker':
+        run_worker(args)
+        return
     
     # 验证输入文件是否存在
     video_path = Path(args.video)
@@ -143,26 +580,28 @@ def main():
         return
     
     try:
-        # 初始化处理器
-        handler = WebpageHandler()
-        handler.sample_rate = args.sample_rate
+        # 初始化LLM客户端和处理器
+        llm_client, response_cache, llm = build_llm(args)
+        handler = build_handler(args, llm, build_evaluator(args))
         
         print(f"开始处理视频: {video_path}")
         print(f"采样率: {args.sample_rate}秒")
+        print(f"采样方式: {args.sampling}")
         
-        results = {}
-        
-        # 根据模式运行相应的分析
-        if args.mode in ['full', 'both']:
-            results['full'] = run_full_analysis(handler, video_path, args.output)
-            
-        if args.mode in ['ablation', 'both']:
-            ablation_output = os.path.join(args.output, 'ablation')
-            results['ablation'] = run_ablation_study(handler, video_path, ablation_output)
+        run_job(handler, video_path, args.output, args.mode, args.pairwise)
         
-        # 在both模式下运行评估
-        if args.mode == 'evaluate':
-            results['evaluate'] = run_evaluate(handler, args.output)
+        if handler.extract_stats:
+            print_extract_stats(handler.extract_stats)
+        if handler.preprocessor.encoder.stats:
+            print_encode_stats(handler.preprocessor.encoder)
+        if handler.stream_stats:
+            print_stream_stats(handler.stream_stats)
+        print_metrics_cache_stats(handler.evaluator)
+        if response_cache is not None:
+            cache_stats = response_cache.stats()
+            print(f"\n响应缓存: 命中 {cache_stats['hits']} 次, 未命中 {cache_stats['misses']} 次 "
+                  f"({response_cache.cache_dir})")
+        llm_client.close()
             
         
     except Exception as e:
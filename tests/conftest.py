@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试以仓库根目录为导入起点（与 main.py 一致，使用 utils.xxx）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
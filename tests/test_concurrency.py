@@ -0,0 +1,83 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from utils.concurrency import run_concurrently
+from utils.edges import detect_edge_points
+from utils.preprocess import ImagePreprocessor
+
+
+def test_run_concurrently_collects_results_and_errors():
+    def fail():
+        raise ValueError('boom')
+
+    results = run_concurrently({'ok': lambda: 1, 'fail': fail})
+
+    assert results['ok'] == 1
+    assert isinstance(results['fail'], ValueError)
+
+
+def test_run_concurrently_notifies_timed_out_calls():
+    timed_out = []
+    results = run_concurrently({'slow': lambda: time.sleep(0.5), 'fast': lambda: 'ok'},
+                               timeout=0.1, on_timeout=timed_out.append)
+
+    assert results['fast'] == 'ok'
+    assert isinstance(results['slow'], TimeoutError)
+    assert timed_out == ['slow']
+
+
+def test_run_concurrently_hung_call_does_not_starve_queue():
+    release = threading.Event()
+    results = run_concurrently({'hung': release.wait, 'next': lambda: 'ok'}, max_workers=1, timeout=0.1)
+    release.set()
+
+    assert isinstance(results['hung'], TimeoutError)
+    assert results['next'] == 'ok'
+
+
+def test_run_concurrently_uses_daemon_threads():
+    release = threading.Event()
+    run_concurrently({'hung': release.wait}, timeout=0.05)
+
+    hung = [thread for thread in threading.enumerate() if thread.name.startswith('fan-out')]
+    release.set()
+    # 被放弃的线程不会在解释器退出时被等待
+    assert hung and all(thread.daemon for thread in hung)
+
+
+class VisionLLM:
+    def __init__(self, fail_edge=False, fail_direct=False):
+        self.fail_edge = fail_edge
+        self.fail_direct = fail_direct
+
+    def analyze_image_base64(self, prompt, image_base64):
+        edge = 'edge detection' in prompt
+        if (edge and self.fail_edge) or (not edge and self.fail_direct):
+            raise RuntimeError('vision failed')
+        return 'edge result' if edge else 'direct result'
+
+
+def analyze(llm):
+    image = np.zeros((32, 32, 3), dtype=np.uint8)
+    image[8:24, 8:24] = 255
+    return ImagePreprocessor(llm).combined_analysis(image, detect_edge_points(image))
+
+
+def test_combined_analysis_keeps_successful_result():
+    analysis = analyze(VisionLLM(fail_edge=True))
+
+    assert analysis['direct_analysis'] == 'direct result'
+    assert analysis['edge_analysis'] is None
+    assert analysis['errors'] == {'edge_analysis': 'vision failed'}
+
+
+def test_combined_analysis_without_errors():
+    assert analyze(VisionLLM()) == {'direct_analysis': 'direct result', 'edge_analysis': 'edge result'}
+
+
+def test_combined_analysis_raises_when_everything_failed():
+    with pytest.raises(RuntimeError):
+        analyze(VisionLLM(fail_edge=True, fail_direct=True))
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from utils.corpus_eval import CorpusEvaluation
+
+
+class Evaluator:
+    weights = {'text_similarity': 1.0}
+
+
+def record(run, strategy, score=None, error=None):
+    data = {'run': run, 'file': f'{strategy}.html', 'strategy': strategy}
+    if error:
+        data['error'] = error
+    else:
+        data.update(overall_score=score, metrics={'text_similarity': score / 2},
+                    tree_distance_method='zss', text_similarity_method='difflib')
+    return data
+
+
+def summarize(tmp_path, records):
+    path = tmp_path / 'results.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in records:
+            f.write(json.dumps(item) + '\n')
+        f.write('{"run": "broken')  # 中断时写了一半的行
+    return CorpusEvaluation(Evaluator(), str(tmp_path), results_path=str(path)).summarize()
+
+
+def test_summary_uses_last_record_per_pair(tmp_path):
+    summary = summarize(tmp_path, [
+        record('run1', 'cot', 0.2),
+        record('run2', 'cot', error='ValueError: boom'),
+        record('run3', 'cot', 0.4),
+        record('run1', 'cot', 0.6),                       # 重新评估覆盖旧分数
+        record('run2', 'cot', 0.8),                       # 先失败后成功
+        record('run3', 'cot', error='TimeoutError: x'),   # 先成功后失败
+        record('run1', 'tot', error='ValueError: boom'),
+    ])
+
+    assert summary['pairs'] == 4
+    cot = summary['strategies']['cot']
+    assert (cot['count'], cot['failed']) == (2, 1)
+    assert list(cot['scores']) == ['overall_score', 'text_similarity']
+    assert cot['scores']['overall_score']['mean'] == pytest.approx(0.7)
+    assert cot['scores']['overall_score']['min'] == pytest.approx(0.6)
+    assert cot['scores']['text_similarity']['max'] == pytest.approx(0.4)
+    assert summary['strategies']['tot'] == {'count': 0, 'failed': 1, 'scores': {}}
@@ -0,0 +1,80 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from utils.edge_store import EDGE_DTYPE, edges_to_array, load_edges_json, save_edges
+
+SAMPLE_JSON = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'samples', 'edges.json')
+
+
+def legacy_frames():
+    """samples/edges.json 的第一帧拆成两帧，覆盖多帧偏移"""
+    with open(SAMPLE_JSON, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    edges = data["frames"][0]["edges"]
+    half = len(edges) // 2
+    data["frames"] = [
+        {"frame_id": 0, "timestamp": 0, "edges": edges[:half]},
+        {"frame_id": 1, "timestamp": 1.0, "edges": edges[half:]},
+        {"frame_id": 2, "timestamp": 2.0, "edges": []},
+    ]
+    return data
+
+
+def write_new_format(data, output_dir):
+    """按 WebpageHandler.run 的方式写出 edges.npy 与引用它的 edges.json"""
+    refs = save_edges([frame["edges"] for frame in data["frames"]], os.path.join(output_dir, 'edges.npy'))
+    frames = [dict(frame, edges=ref) for frame, ref in zip(data["frames"], refs)]
+    json_path = os.path.join(output_dir, 'edges.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({"timestamp": data["timestamp"], "frames": frames}, f)
+    return json_path
+
+
+def test_legacy_sample_loads_as_points():
+    data = load_edges_json(SAMPLE_JSON)
+
+    with open(SAMPLE_JSON, 'r', encoding='utf-8') as f:
+        raw = json.load(f)["frames"][0]["edges"]
+    points = data["frames"][0]["edges"]
+    assert points.dtype == EDGE_DTYPE and points.shape == (len(raw), 2)
+    assert points[0].tolist() == [raw[0]["x"], raw[0]["y"]]
+    assert points[-1].tolist() == [raw[-1]["x"], raw[-1]["y"]]
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_npy_sidecar_and_legacy_json_give_identical_points(tmp_path, mmap):
+    legacy = legacy_frames()
+    legacy_path = tmp_path / 'legacy.json'
+    legacy_path.write_text(json.dumps(legacy), encoding='utf-8')
+    new_dir = tmp_path / 'new'
+    new_dir.mkdir()
+    new_path = write_new_format(legacy, str(new_dir))
+
+    old = load_edges_json(str(legacy_path))
+    new = load_edges_json(new_path, mmap=mmap)
+
+    assert [frame["frame_id"] for frame in new["frames"]] == [0, 1, 2]
+    for old_frame, new_frame, raw_frame in zip(old["frames"], new["frames"], legacy["frames"]):
+        assert new_frame["edges"].dtype == EDGE_DTYPE
+        assert np.array_equal(new_frame["edges"], old_frame["edges"])
+        assert len(new_frame["edges"]) == len(raw_frame["edges"])
+        # 内存映射时各帧是同一个 .npy 的只读视图，不复制数据
+        assert isinstance(new_frame["edges"].base, np.memmap) == mmap
+
+
+def test_save_edges_accepts_arrays_and_dict_lists(tmp_path):
+    legacy = legacy_frames()
+    frames_edges = [edges_to_array(legacy["frames"][0]["edges"]), legacy["frames"][1]["edges"]]
+    refs = save_edges(frames_edges, str(tmp_path / 'edges.npy'))
+
+    assert [ref["offset"] for ref in refs] == [0, len(frames_edges[0])]
+    stored = np.load(tmp_path / 'edges.npy')
+    assert np.array_equal(stored, np.concatenate([edges_to_array(edges) for edges in frames_edges]))
+
+
+def test_edges_out_of_int16_range_are_rejected():
+    with pytest.raises(ValueError):
+        edges_to_array([{"x": 40000, "y": 1}])
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from utils.edges import detect_edge_points, detect_edges_parallel
+
+
+def make_frames(count):
+    frames = []
+    for index in range(count):
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        frame[10 + index:60 + index, 20:80 + 5 * index] = 255
+        frames.append((index, index * 0.5, frame))
+    return frames
+
+
+def shared_blocks():
+    return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+
+def test_parallel_matches_serial_in_order():
+    frames = make_frames(7)
+    before = shared_blocks()
+
+    results = list(detect_edges_parallel(iter(frames), workers=2))
+
+    assert [frame_id for frame_id, _, _, _ in results] == list(range(7))
+    for (_, _, frame), (_, _, returned, edges) in zip(frames, results):
+        assert returned is frame or np.array_equal(returned, frame)
+        assert np.array_equal(edges, detect_edge_points(frame))
+    # 共享内存块全部释放
+    assert shared_blocks() <= before
+
+
+def test_parallel_releases_shared_memory_when_closed_early():
+    before = shared_blocks()
+    results = detect_edges_parallel(iter(make_frames(6)), workers=2)
+    next(results)
+    results.close()
+
+    assert shared_blocks() <= before
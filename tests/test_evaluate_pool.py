@@ -0,0 +1,33 @@
+import os
+
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.evaluate import HTMLEvaluator
+
+PAGE = "<html><body><div><p>{}</p></div></body></html>"
+
+
+class CrashingEvaluator(HTMLEvaluator):
+    """遇到含 CRASH 的页面时让子进程直接退出，模拟 OOM/段错误"""
+
+    def _compute_metrics(self, html1, html2):
+        if 'CRASH' in html2:
+            os._exit(1)
+        return super()._compute_metrics(html1, html2)
+
+
+def test_crashed_worker_only_fails_its_own_pair(monkeypatch, capsys):
+    # 单核机器上 jobs 会被限制为1而不走进程池
+    monkeypatch.setattr('utils.evaluate.multiprocessing.cpu_count', lambda: 2)
+    evaluator = CrashingEvaluator()
+    pairs = [(PAGE.format('base'), PAGE.format(text)) for text in ('one', 'CRASH', 'two', 'three', 'four')]
+
+    reports = evaluator.generate_reports(pairs, jobs=2)
+
+    assert len(reports) == len(pairs)
+    assert '已重建进程池' in capsys.readouterr().out
+    assert isinstance(reports[1], BrokenProcessPool)
+    for index in (0, 2, 3, 4):
+        assert not isinstance(reports[index], Exception), reports[index]
+        expected = HTMLEvaluator().generate_report(*pairs[index])
+        assert reports[index]['overall_score'] == expected['overall_score']
@@ -0,0 +1,120 @@
+import itertools
+import threading
+
+import pytest
+
+from utils.html_stream import FenceStripper, StreamCancelled, stream_to_file, strip_code_fences
+from utils.response_cache import CachedLLMUtil, ResponseCache
+
+HTML = "<!DOCTYPE html>\n<html><body><p>`code`</p></body></html>"
+
+
+FENCED_TEXTS = [
+    '  ```html\n<a>``</a>```',
+    f"```html\n{HTML}\n```\n",
+    f"{HTML}```",
+    f"\n{HTML}\n``\n",
+    "```\n<p>`x`</p> ``` \n",
+    "``",
+    "```html",
+    "  \n ",
+]
+
+
+def test_strip_code_fences():
+    assert strip_code_fences(f"```html\n{HTML}\n```") == HTML
+    assert strip_code_fences(f"```html\n{HTML}```") == HTML
+    assert strip_code_fences('  ```html\n<a>``</a>```') == '<a>``</a>'
+    assert strip_code_fences(HTML) == HTML
+
+
+def stream(chunks):
+    stripper = FenceStripper()
+    return ''.join(stripper.feed(chunk) for chunk in chunks) + stripper.finish()
+
+
+def splits(text, cuts):
+    bounds = [0, *cuts, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize('text', FENCED_TEXTS)
+def test_streaming_matches_one_shot_for_every_split(text):
+    expected = strip_code_fences(text)
+    # 所有一处和两处切分，以及逐字符输入
+    for count in (1, 2):
+        for cuts in itertools.combinations_with_replacement(range(len(text) + 1), count):
+            assert stream(splits(text, cuts)) == expected, cuts
+    assert stream(list(text)) == expected
+
+
+@pytest.mark.parametrize('text', [text for text in FENCED_TEXTS if len(text) <= 12] + ['```\n`a```', 'a`` `\n```'])
+def test_streaming_matches_one_shot_for_all_chunkings(text):
+    expected = strip_code_fences(text)
+    for mask in range(2 ** max(len(text) - 1, 0)):
+        cuts = [index + 1 for index in range(len(text) - 1) if mask >> index & 1]
+        assert stream(splits(text, cuts)) == expected, cuts
+
+
+class Chunks:
+    """可关闭的片段迭代器，记录是否被关闭"""
+
+    def __init__(self, chunks, on_chunk=None):
+        self.chunks = iter(chunks)
+        self.on_chunk = on_chunk
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self.chunks)
+        if self.on_chunk:
+            self.on_chunk(chunk)
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_to_file_cancel_removes_partial_file(tmp_path):
+    path = tmp_path / 'page.html'
+    cancel = threading.Event()
+    chunks = Chunks(['<html>', '<body>', '</body>', '</html>'],
+                    on_chunk=lambda chunk: chunk == '<body>' and cancel.set())
+
+    with pytest.raises(StreamCancelled):
+        stream_to_file(chunks, path, cancel=cancel)
+
+    assert chunks.closed
+    assert not path.exists()
+
+
+def test_stream_to_file_error_removes_partial_file(tmp_path):
+    path = tmp_path / 'page.html'
+
+    def chunks():
+        yield '<html>'
+        raise ConnectionError('stream dropped')
+
+    with pytest.raises(ConnectionError):
+        stream_to_file(chunks(), path)
+    assert not path.exists()
+
+
+def test_cached_stream_close_closes_source_and_skips_cache(tmp_path):
+    source = Chunks(['<html>', '<body>', '</html>'])
+
+    class LLM:
+        model = 'stub'
+
+        def stream_chat(self, prompt):
+            return source
+
+    cached = CachedLLMUtil(LLM(), ResponseCache(str(tmp_path)))
+    stream = cached.stream_chat('prompt')
+    assert next(stream) == '<html>'
+    stream.close()
+
+    assert source.closed
+    assert cached.cache.get(cached.cache.make_key('native_chat', 'stub', 'prompt')) is None
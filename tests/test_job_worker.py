@@ -0,0 +1,137 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from utils.job_worker import JobWorker
+
+
+def make_worker(spool, runner=None, **kwargs):
+    return JobWorker(runner or (lambda job: {'output': job['output']}), str(spool), poll_interval=0.01, **kwargs)
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_submit_writes_queued_status(tmp_path):
+    worker = make_worker(tmp_path)
+    status = worker.submit({'video': 'v.mp4', 'output': 'out'})
+
+    assert status['state'] == 'queued'
+    assert status['mode'] == 'both'
+    assert worker.status(status['id'])['state'] == 'queued'
+    assert worker.counts()['incoming'] == 1
+
+
+def test_submit_rejects_invalid_job(tmp_path):
+    worker = make_worker(tmp_path)
+    with pytest.raises(ValueError):
+        worker.submit({'video': 'v.mp4', 'output': 'out', 'mode': 'corpus'})
+    with pytest.raises(ValueError):
+        worker.submit({'mode': 'full', 'output': 'out'})
+
+
+def test_claim_is_exclusive_between_workers(tmp_path):
+    worker_a = make_worker(tmp_path)
+    worker_b = make_worker(tmp_path)
+    worker_b.pid += 1  # 模拟同一 spool 上的另一个 worker 进程
+    job_id = worker_a.submit({'video': 'v.mp4', 'output': 'out'})['id']
+
+    claimed = worker_a._claim(1)
+
+    assert [job for job, _ in claimed] == [job_id]
+    assert os.path.basename(claimed[0][1]) == f'{job_id}@{worker_a.owner}.json'
+    assert worker_b._claim(1) == []
+
+
+def test_recover_keeps_jobs_of_live_workers(tmp_path):
+    worker_a = make_worker(tmp_path)
+    worker_b = make_worker(tmp_path)
+    worker_a.submit({'video': 'v.mp4', 'output': 'out'})
+    worker_a._claim(1)
+
+    assert worker_b.recover() == 0
+    assert worker_b.counts() == {'incoming': 0, 'running': 1, 'done': 0, 'failed': 0}
+
+
+def test_recover_requeues_jobs_of_dead_worker(tmp_path):
+    worker = make_worker(tmp_path)
+    job_id = worker.submit({'video': 'v.mp4', 'output': 'out'})['id']
+    os.rename(os.path.join(tmp_path, 'incoming', f'{job_id}.json'),
+              os.path.join(tmp_path, 'running', f'{job_id}@{worker.host}@{dead_pid()}.json'))
+
+    assert worker.recover() == 1
+    assert os.path.exists(os.path.join(tmp_path, 'incoming', f'{job_id}.json'))
+
+
+def test_recover_uses_heartbeat_for_other_hosts(tmp_path):
+    worker = make_worker(tmp_path, stale_after=60)
+    fresh = os.path.join(tmp_path, 'running', 'fresh@other-host@123.json')
+    stale = os.path.join(tmp_path, 'running', 'stale@other-host@123.json')
+    for path in (fresh, stale):
+        with open(path, 'w') as f:
+            json.dump({'video': 'v.mp4', 'output': 'out'}, f)
+    old = time.time() - 120
+    os.utime(stale, (old, old))
+
+    assert worker.recover() == 1
+    assert os.path.exists(fresh)
+    assert os.path.exists(os.path.join(tmp_path, 'incoming', 'stale.json'))
+
+
+def test_run_moves_jobs_through_states(tmp_path):
+    seen = []
+    worker = make_worker(tmp_path, runner=lambda job: seen.append(job['id']) or {'ok': True})
+    ok_id = worker.submit({'video': 'v.mp4', 'output': 'out'})['id']
+    with open(os.path.join(tmp_path, 'incoming', 'broken.json'), 'w') as f:
+        f.write('not json')
+
+    stats = worker.run(drain=True)
+
+    assert stats == {'done': 1, 'failed': 1}
+    assert seen == [ok_id]
+    done = worker.status(ok_id)
+    assert done['state'] == 'done'
+    assert done['result'] == {'ok': True}
+    assert done['worker'] == worker.owner
+    assert done['finished_at'] >= done['started_at']
+    assert worker.status('broken')['state'] == 'failed'
+    assert worker.counts() == {'incoming': 0, 'running': 0, 'done': 1, 'failed': 1}
+
+
+def test_runner_error_marks_job_failed(tmp_path):
+    def runner(job):
+        raise RuntimeError('boom')
+
+    worker = make_worker(tmp_path, runner=runner)
+    job_id = worker.submit({'video': 'v.mp4', 'output': 'out'})['id']
+
+    worker.run(drain=True)
+
+    status = worker.status(job_id)
+    assert status['state'] == 'failed'
+    assert status['error'] == 'RuntimeError: boom'
+
+
+def test_bookkeeping_errors_are_reported_not_lost(tmp_path, capsys):
+    def on_job_finished(status):
+        raise RuntimeError('callback failed')
+
+    worker = make_worker(tmp_path, on_job_finished=on_job_finished)
+    job_id = worker.submit({'video': 'v.mp4', 'output': 'out'})['id']
+    (_, job_path), = worker._claim(1)
+    os.remove(job_path)  # 任务文件在运行期间被移走
+
+    status = worker._execute(job_id, job_path)
+
+    assert status['state'] == 'failed'
+    assert worker.stats['failed'] == 1
+    output = capsys.readouterr().out
+    assert '收尾失败' in output
+    assert '完成回调失败' in output
@@ -0,0 +1,168 @@
+import base64
+import threading
+import time
+from email.utils import formatdate
+
+import numpy as np
+import pytest
+
+from utils.encoder import ImageEncoder
+from utils.llm_client import (HTTPBackend, LLMClient, LLMHTTPError, MockLLMServer, RateLimiter, RetryPolicy,
+                              create_llm_client, image_mime_type)
+
+
+@pytest.mark.parametrize('fmt, mime_type', [('jpg', 'image/jpeg'), ('webp', 'image/webp'), ('png', 'image/png')])
+def test_image_mime_type_matches_encoder_format(fmt, mime_type):
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    assert image_mime_type(ImageEncoder(fmt=fmt).encode_base64(image)) == mime_type
+
+
+def test_image_mime_type_defaults_to_jpeg():
+    assert image_mime_type(base64.b64encode(b'unknown image data').decode()) == 'image/jpeg'
+
+
+def test_retry_after_seconds():
+    policy = RetryPolicy(max_delay=30)
+    assert policy.delay(0, LLMHTTPError(429, 'slow down', '3')) == 3.0
+    assert policy.delay(0, LLMHTTPError(429, 'slow down', '0')) == 0.0
+    assert policy.delay(0, LLMHTTPError(429, 'slow down', '120')) == 30
+
+
+def test_retry_after_http_date():
+    policy = RetryPolicy(max_delay=30)
+    delay = policy.delay(0, LLMHTTPError(503, 'busy', formatdate(time.time() + 10, usegmt=True)))
+    assert 8 <= delay <= 10
+    # 已经过去的时间点不需要等待
+    assert policy.delay(0, LLMHTTPError(503, 'busy', formatdate(time.time() - 60, usegmt=True))) == 0.0
+
+
+def test_invalid_retry_after_falls_back_to_jitter():
+    policy = RetryPolicy(base_delay=1.0, max_delay=30)
+    delay = policy.delay(2, LLMHTTPError(429, 'slow down', 'soon'))
+    assert 0 <= delay <= 4
+
+
+class FakeClock:
+    """替换 utils.llm_client 中的 time：主线程的 sleep 只记录并推进时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # 模拟服务在请求线程中调用 sleep(latency)，不计入
+        if threading.current_thread() is threading.main_thread():
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr('utils.llm_client.time', clock)
+    return clock
+
+
+@pytest.fixture
+def server():
+    server = MockLLMServer().start()
+    yield server
+    server.stop()
+
+
+def test_mock_backend_serves_text_and_vision_calls():
+    client = create_llm_client('mock')
+    try:
+        html = client.native_chat('build a page')
+        analysis = client.analyze_image_base64('describe', base64.b64encode(b'\x89PNG\r\n\x1a\n....').decode())
+    finally:
+        client.close()
+
+    assert html.startswith('<!DOCTYPE html>')
+    assert 'Prompt length: 12' in html
+    assert analysis.startswith('Mock UI analysis (8 prompt chars)')
+    assert client.backend.server.requests == 2
+
+
+def test_retries_429_and_honours_retry_after(clock):
+    server = MockLLMServer(fail_every=2, retry_after=3).start()
+    client = LLMClient(HTTPBackend(server.url, 'mock'), retry_policy=RetryPolicy(max_retries=2))
+    try:
+        client.native_chat('first')
+        html = client.native_chat('second')  # 第2个请求返回429，重试后成功
+    finally:
+        client.close()
+        server.stop()
+
+    assert html.startswith('<!DOCTYPE html>')
+    assert server.requests == 3
+    assert clock.sleeps == [3.0]
+
+
+def test_gives_up_after_max_retries(clock):
+    server = MockLLMServer(fail_every=1).start()
+    client = LLMClient(HTTPBackend(server.url, 'mock'), retry_policy=RetryPolicy(max_retries=2))
+    try:
+        with pytest.raises(LLMHTTPError) as error:
+            client.native_chat('always limited')
+    finally:
+        client.close()
+        server.stop()
+
+    assert error.value.status == 429
+    assert server.requests == 3
+    assert clock.sleeps == [0.0, 0.0]
+
+
+def test_rate_limiter_throttles_requests(clock, server):
+    client = LLMClient(HTTPBackend(server.url, 'mock'), RateLimiter(rpm=2))
+    for index in range(3):
+        client.native_chat(f'prompt {index}')
+    client.close()
+
+    # 每分钟2个请求：前两个立即发出，第三个等待补充一个令牌（30秒）
+    assert server.requests == 3
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+
+
+def test_token_bucket_limits_tokens_per_minute(clock):
+    limiter = RateLimiter(tpm=600)
+    limiter.acquire(600)
+    limiter.acquire(100)
+
+    assert sum(clock.sleeps) == pytest.approx(10.0)
+
+
+def test_streams_sse_chunks(server):
+    client = LLMClient(HTTPBackend(server.url, 'mock'))
+    chunks = list(client.stream_chat('stream this page'))
+    client.close()
+
+    assert len(chunks) > 1
+    assert ''.join(chunks) == MockLLMServer.respond('stream this page')
+
+
+def test_reuses_one_session_connection(server):
+    backend = HTTPBackend(server.url, 'mock')
+    client = LLMClient(backend)
+    session = backend.session
+    for index in range(5):
+        client.native_chat(f'prompt {index}')
+    list(client.stream_chat('stream'))
+
+    pools = list(session.get_adapter(server.url).poolmanager.pools._container.values())
+    client.close()
+
+    assert backend.session is session
+    assert server.requests == 6
+    # keep-alive：所有请求复用同一个连接
+    assert len(pools) == 1 and pools[0].num_connections == 1
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.metrics import FRAMES_RETRIEVED
+from utils.run_context import RunContext
+from utils.webpage_handler import WebpageHandler
+
+
+class SlowPreprocessor:
+    """直接分析阻塞到 release 被设置为止"""
+
+    def __init__(self, timeout=None, fail=False):
+        self.timeout = timeout
+        self.fail = fail
+        self.calls = 0
+        self.release = threading.Event()
+
+    def direct_image_understanding(self, frame):
+        self.calls += 1
+        self.release.wait()
+        if self.fail:
+            self.fail = False
+            raise RuntimeError('vision failed')
+        return 'direct result'
+
+
+def make_context(preprocessor):
+    context = RunContext('missing.mp4', preprocessor)
+    context.provide_frame(np.zeros((8, 8, 3), dtype=np.uint8))
+    return context
+
+
+def test_timed_out_direct_analysis_does_not_block_later_callers():
+    preprocessor = SlowPreprocessor(timeout=0.1)
+    context = make_context(preprocessor)
+
+    for _ in range(2):
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            context.direct_analysis()
+        assert time.monotonic() - start < 1
+
+    preprocessor.release.set()
+    assert context.direct_analysis() == 'direct result'
+    # 超时的调用者放弃等待，但视觉调用只发起一次
+    assert preprocessor.calls == 1
+
+
+def test_failed_direct_analysis_is_retried():
+    preprocessor = SlowPreprocessor(fail=True)
+    preprocessor.release.set()
+    context = make_context(preprocessor)
+
+    with pytest.raises(RuntimeError):
+        context.direct_analysis()
+    assert context.direct_analysis() == 'direct result'
+    assert preprocessor.calls == 2
+
+
+class VisionLLM:
+    def analyze_image_base64(self, prompt, image_base64):
+        return 'analysis'
+
+
+def write_video(path, frames=6):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 2, (64, 48))
+    for index in range(frames):
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        frame[5:20, 5 + index * 5:25 + index * 5] = 255
+        writer.write(frame)
+    writer.release()
+
+
+def test_multi_frame_stream_provides_first_frame(tmp_path):
+    video_path = tmp_path / 'video.mp4'
+    write_video(video_path)
+    handler = WebpageHandler(llm_util=VisionLLM())
+    handler.workers = 1
+    context = RunContext(str(video_path), handler.preprocessor)
+    before = FRAMES_RETRIEVED._default().value
+
+    frames = list(handler.iter_frame_analysis(str(video_path), context=context))
+
+    assert frames[0]['analysis']['direct_analysis'] == 'analysis'
+    assert context.frame is not None
+    # 第一帧只在帧流中解码一次，context 没有再次读取视频
+    assert FRAMES_RETRIEVED._default().value - before == handler.extract_stats['frames_retrieved']
+
+
+@pytest.mark.parametrize('sampling, read_key', [('grab', 'frames_grabbed'), ('read', 'frames_grabbed'),
+                                                ('seek', 'sampled_reads')])
+def test_extract_stats_separate_seek_reads_from_decoded_frames(tmp_path, sampling, read_key):
+    video_path = tmp_path / 'video.mp4'
+    write_video(video_path, frames=6)
+    handler = WebpageHandler(llm_util=VisionLLM())
+    handler.sample_rate = 1  # 2 fps，每2帧取一帧
+
+    frames = handler.extract_frames(str(video_path), sampling)
+
+    stats = handler.extract_stats
+    assert len(frames) == stats['frames_kept'] == 3
+    assert set(stats) & {'frames_grabbed', 'sampled_reads'} == {read_key}
+    assert stats[read_key] == (3 if sampling == 'seek' else 6)
@@ -0,0 +1,68 @@
+import importlib
+import importlib.abc
+import importlib.util
+import sys
+
+import pytest
+
+from utils.startup_profile import ImportProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    profiler = ImportProfiler().install()
+    names = set(sys.modules)
+    yield profiler
+    profiler.uninstall()
+    for name in set(sys.modules) - names:
+        del sys.modules[name]
+
+
+def test_records_nested_imports(tmp_path, profiler):
+    (tmp_path / 'profiled_child.py').write_text("import time\ntime.sleep(0.02)\n")
+    (tmp_path / 'profiled_parent.py').write_text("import profiled_child\n")
+
+    module = importlib.import_module('profiled_parent')
+
+    parent = profiler.records['profiled_parent']
+    child = profiler.records['profiled_child']
+    assert child['self'] >= 0.02
+    assert parent['cumulative'] >= child['cumulative']
+    assert parent['self'] < child['self']
+    # 其它属性转发给原加载器
+    assert module.__loader__.get_filename('profiled_parent') == str(tmp_path / 'profiled_parent.py')
+
+
+class SharedLoader(importlib.abc.Loader):
+    """一个实例为多个模块服务的加载器"""
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        module.loaded_by = self
+
+
+class SharedLoaderFinder(importlib.abc.MetaPathFinder):
+    def __init__(self):
+        self.loader = SharedLoader()
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname.startswith('shared_loader_'):
+            return importlib.util.spec_from_loader(fullname, self.loader)
+        return None
+
+
+def test_shared_loader_is_not_modified(profiler):
+    finder = SharedLoaderFinder()
+    sys.meta_path.append(finder)
+    try:
+        first = importlib.import_module('shared_loader_a')
+        second = importlib.import_module('shared_loader_b')
+    finally:
+        sys.meta_path.remove(finder)
+
+    assert 'exec_module' not in vars(finder.loader)
+    assert first.loaded_by is finder.loader and second.loaded_by is finder.loader
+    assert {'shared_loader_a', 'shared_loader_b'} <= set(profiler.records)
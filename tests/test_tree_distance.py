@@ -0,0 +1,29 @@
+import pytest
+
+from utils import tree_distance
+from utils.tree_distance import TreeDistanceEngine
+
+
+def test_default_cutoff_follows_exact_algorithm(monkeypatch):
+    monkeypatch.setattr(tree_distance, 'APTED', None)
+    assert TreeDistanceEngine().cutoff == tree_distance.ZSS_CUTOFF
+    assert TreeDistanceEngine(cutoff=300).cutoff == 300
+
+
+def test_default_cutoff_with_apted():
+    pytest.importorskip('apted')
+    assert TreeDistanceEngine().cutoff == tree_distance.APTED_CUTOFF
+
+
+def test_zss_fallback_warns_once(monkeypatch, capsys):
+    from zss import Node
+    monkeypatch.setattr(tree_distance, 'APTED', None)
+    monkeypatch.setattr(tree_distance, '_fallback_warned', False)
+    engine = TreeDistanceEngine(mode='exact')
+    tree1 = Node('html').addkid(Node('body').addkid(Node('div')))
+    tree2 = Node('html').addkid(Node('body').addkid(Node('p')))
+
+    assert engine.exact_distance(tree1, tree2) == 1
+    engine.exact_distance(tree1, tree2)
+
+    assert capsys.readouterr().out.count('未安装 apted') == 1
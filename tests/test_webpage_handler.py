@@ -0,0 +1,90 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from utils.webpage_handler import WebpageHandler
+
+
+class DecoderAborted(BaseException):
+    """不是 Exception 子类的异常，模拟解码线程中的 SystemExit 等"""
+
+
+def make_handler(decode):
+    handler = WebpageHandler(llm_util=object())
+    handler._decode_frames = lambda video_path, sampling: decode()
+    return handler
+
+
+def frames(count):
+    for index in range(count):
+        yield index, float(index), np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def test_iter_frames_prefetch_yields_all_frames():
+    handler = make_handler(lambda: frames(10))
+    assert [frame_id for frame_id, _, _ in handler.iter_frames('v.mp4', prefetch=2)] == list(range(10))
+
+
+@pytest.mark.parametrize('error', [RuntimeError('decode failed'), DecoderAborted()])
+def test_iter_frames_propagates_decoder_errors(error):
+    def decode():
+        yield from frames(3)
+        raise error
+
+    handler = make_handler(decode)
+    seen = []
+    with pytest.raises(type(error)):
+        for frame_id, _, _ in handler.iter_frames('v.mp4', prefetch=2):
+            seen.append(frame_id)
+    assert seen == [0, 1, 2]
+
+
+def generate(handler, tmp_path):
+    data = {'frames': [{'analysis': {'direct_analysis': 'direct', 'edge_analysis': 'edge'}}]}
+    return handler.generate_html(json.dumps(data), tmp_path)
+
+
+def test_generate_html_strips_fences_without_streaming(tmp_path):
+    class LLM:
+        def native_chat(self, prompt):
+            return "```html\n<!DOCTYPE html>\n<html><body></body></html>\n```"
+
+    handler = WebpageHandler(llm_util=LLM())
+    paths = generate(handler, tmp_path)
+
+    assert 'errors' not in paths
+    for path in paths.values():
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == "<!DOCTYPE html>\n<html><body></body></html>"
+
+
+def test_generate_html_stream_timeout_stops_writing(tmp_path):
+    closed = []
+
+    class LLM:
+        def stream_chat(self, prompt):
+            def chunks():
+                try:
+                    yield "<!DOCTYPE html>\n<html><body>"
+                    for _ in range(100):
+                        time.sleep(0.05)
+                        yield "<p>more</p>"
+                finally:
+                    closed.append(prompt)
+            return chunks()
+
+    handler = WebpageHandler(llm_util=LLM())
+    handler.stream = True
+    handler.llm_timeout = 0.3
+    paths = generate(handler, tmp_path)
+
+    assert set(paths) == {'errors'}
+    assert set(paths['errors']) == {'standard_cot', 'tree_of_thought', 'graph_of_thought'}
+    deadline = time.monotonic() + 5
+    while len(closed) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # 超时后各流在下一个片段处停止，不会一直写到结束
+    assert len(closed) == 3
+    assert list((tmp_path / 'html_versions').iterdir()) == []
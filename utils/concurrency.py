@@ -0,0 +1,65 @@
+import itertools
+import queue
+import threading
+import time
+
+_thread_ids = itertools.count()
+
+
+def run_concurrently(tasks, max_workers=None, timeout=None, on_timeout=None):
+    """在线程中并发执行互不依赖的调用
+
+    tasks 为 {name: callable}，返回 {name: 结果}；调用失败或超时时，
+    对应的值为异常对象，其余调用不受影响。
+    timeout 为单个调用的超时秒数，从该调用真正开始执行时计时。
+    线程无法被强制中断，on_timeout(name) 在调用超时时被调用，用于通知该调用自行停止。
+    调用在守护线程中执行：超时的调用被放弃后另起线程处理剩余调用，也不会阻塞解释器退出。
+    """
+    if not tasks:
+        return {}
+    todo = queue.Queue()
+    for item in tasks.items():
+        todo.put(item)
+    finished = queue.Queue()
+    started = {}
+
+    def worker():
+        while True:
+            try:
+                name, func = todo.get_nowait()
+            except queue.Empty:
+                return
+            started[name] = time.monotonic()
+            try:
+                result = func()
+            except BaseException as e:
+                result = e
+            finished.put((name, result))
+
+    def spawn():
+        threading.Thread(target=worker, name=f'fan-out_{next(_thread_ids)}', daemon=True).start()
+
+    for _ in range(min(max_workers or len(tasks), len(tasks))):
+        spawn()
+
+    results = {}
+    while len(results) < len(tasks):
+        try:
+            name, result = finished.get(timeout=0.1 if timeout else None)
+        except queue.Empty:
+            pass
+        else:
+            if name not in results:
+                # KeyboardInterrupt/SystemExit 等与直接调用时一样向上传播
+                if not isinstance(result, Exception) and isinstance(result, BaseException):
+                    raise result
+                results[name] = result
+        if timeout:
+            now = time.monotonic()
+            for name, begin in list(started.items()):
+                if name not in results and now - begin > timeout:
+                    results[name] = TimeoutError(f"{name} 超时 ({timeout}s)")
+                    if on_timeout is not None:
+                        on_timeout(name)
+                    spawn()
+    return {name: results[name] for name in tasks}
@@ -0,0 +1,212 @@
+import json
+import math
+import os
+import time
+from array import array
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95)
+
+
+def is_run_dir(path):
+    """是否为一次运行的输出目录（包含 ablation/index.html 和 html_versions/）"""
+    return (os.path.isfile(os.path.join(path, 'ablation', 'index.html'))
+            and os.path.isdir(os.path.join(path, 'html_versions')))
+
+
+def discover_runs(root):
+    """按名称顺序惰性遍历 root 下的所有运行目录，找到运行目录后不再向下搜索"""
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames.sort()
+        if is_run_dir(dirpath):
+            dirnames[:] = []
+            yield dirpath
+
+
+class CorpusEvaluation:
+    """对包含大量运行目录的根目录做可断点续跑的评估
+
+    每一对（运行目录, 策略HTML）的结果作为一行追加到 JSONL 文件，
+    重新运行时跳过已成功记录的对，失败的对会重新评估。
+    全部完成后再流式读取 JSONL，按策略汇总均值和分位数
+    """
+
+    def __init__(self, evaluator, root, results_path=None, jobs=None, progress_every=100):
+        self.evaluator = evaluator
+        self.root = root
+        self.results_path = results_path or os.path.join(root, 'evaluation_results.jsonl')
+        self.summary_path = os.path.splitext(self.results_path)[0] + '_summary.json'
+        self.jobs = jobs
+        self.progress_every = progress_every
+        self.stats = {'skipped': 0, 'evaluated': 0, 'failed': 0}
+        self._read_errors = []
+
+    def iter_records(self):
+        """逐行读取已有结果，跳过被中断写坏的行"""
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def completed(self):
+        """已成功评估的 (运行目录, 文件名) 集合"""
+        return {(record['run'], record['file']) for record in self.iter_records() if 'error' not in record}
+
+    def iter_pairs(self, done):
+        """惰性产出待评估的 ((运行目录, 文件名), 消融HTML, 策略HTML)，每次只读入一个运行目录"""
+        for run_path in discover_runs(self.root):
+            run = os.path.relpath(run_path, self.root)
+            html_versions_dir = os.path.join(run_path, 'html_versions')
+            filenames = sorted(f for f in os.listdir(html_versions_dir) if f.endswith('.html'))
+            pending = [filename for filename in filenames if (run, filename) not in done]
+            self.stats['skipped'] += len(filenames) - len(pending)
+            if not pending:
+                continue
+            try:
+                ablation_html = _read(os.path.join(run_path, 'ablation', 'index.html'))
+            except (OSError, UnicodeDecodeError) as e:
+                self._read_errors.extend(((run, filename), e) for filename in pending)
+                continue
+            for filename in pending:
+                try:
+                    html = _read(os.path.join(html_versions_dir, filename))
+                except (OSError, UnicodeDecodeError) as e:
+                    self._read_errors.append(((run, filename), e))
+                    continue
+                yield (run, filename), ablation_html, html
+
+    def run(self):
+        """评估所有未完成的对，结果逐行追加写入 JSONL"""
+        done = self.completed()
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(os.path.abspath(self.results_path)), exist_ok=True)
+        # 上次在写入一行的中途被中断时，先补上换行，避免与新记录连在一起
+        needs_newline = False
+        if os.path.exists(self.results_path) and os.path.getsize(self.results_path) > 0:
+            with open(self.results_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        with open(self.results_path, 'a', encoding='utf-8') as f:
+            if needs_newline:
+                f.write('\n')
+            for key, report in self.evaluator.iter_reports(self.iter_pairs(done), self.jobs):
+                self._write_read_errors(f)
+                self._write(f, key, report)
+                done_count = self.stats['evaluated'] + self.stats['failed']
+                if self.progress_every and done_count % self.progress_every == 0:
+                    rate = done_count / (time.perf_counter() - start)
+                    print(f"已评估 {done_count} 对 ({rate:.1f} 对/秒), 跳过 {self.stats['skipped']} 对")
+            self._write_read_errors(f)
+        return self.stats
+
+    def _write_read_errors(self, f):
+        while self._read_errors:
+            key, error = self._read_errors.pop(0)
+            self._write(f, key, error)
+
+    def _write(self, f, key, report):
+        run, filename = key
+        record = {'run': run, 'file': filename, 'strategy': os.path.splitext(filename)[0]}
+        if isinstance(report, Exception):
+            record['error'] = f"{type(report).__name__}: {report}"
+            self.stats['failed'] += 1
+        else:
+            record.update({
+                'overall_score': report['overall_score'],
+                'metrics': report['detailed_metrics'],
+                'tree_distance_method': report['tree_distance_method'],
+                'text_similarity_method': report['text_similarity_method']
+            })
+            self.stats['evaluated'] += 1
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.flush()
+
+    def summarize(self):
+        """流式读取 JSONL，按策略计算总分与各指标的均值、分位数，写入汇总文件
+
+        同一对有多条记录时（先失败后重试成功）以最后一条为准。
+        读取时只保留每对的去重键和所在的行号，分数按策略存入 float 数组，不保留完整记录
+        """
+        latest = {}  # (运行目录, 文件名) -> (策略, 分数所在行号；失败时为 None)
+        columns = {}  # 策略 -> {分数名: array('d')}，被覆盖的行置为 NaN
+        for record in self.iter_records():
+            key = (record['run'], record['file'])
+            strategy = record['strategy']
+            table = columns.setdefault(strategy, {})
+            previous = latest.get(key)
+            row = previous[1] if previous else None
+            if 'error' in record:
+                if row is not None:
+                    _set_row(table, row, {})
+                latest[key] = (strategy, None)
+                continue
+            values = dict(record['metrics'], overall_score=record['overall_score'])
+            if row is None:
+                row = len(table['overall_score']) if table else 0
+            _set_row(table, row, values)
+            latest[key] = (strategy, row)
+
+        counts = {}
+        failures = {}
+        for strategy, row in latest.values():
+            target = failures if row is None else counts
+            target[strategy] = target.get(strategy, 0) + 1
+
+        strategies = {}
+        for strategy in sorted(set(counts) | set(failures)):
+            table = columns.get(strategy, {})
+            scores = {}
+            if counts.get(strategy):
+                # overall_score 放在最前，其余指标按首次出现的顺序
+                for name in ['overall_score'] + [name for name in table if name != 'overall_score']:
+                    description = _describe(table[name])
+                    if description is not None:
+                        scores[name] = description
+            strategies[strategy] = {
+                'count': counts.get(strategy, 0),
+                'failed': failures.get(strategy, 0),
+                'scores': scores
+            }
+        summary = {
+            'root': os.path.abspath(self.root),
+            'results_file': os.path.abspath(self.results_path),
+            'weights_used': self.evaluator.weights,
+            'pairs': len(latest),
+            'strategies': strategies
+        }
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+
+def _set_row(table, row, values):
+    """写入第 row 行的分数，缺少的分数（以及整行作废时）记为 NaN"""
+    length = max(row + 1, len(table['overall_score']) if table else 0)
+    for name in values:
+        if name not in table:
+            table[name] = array('d', [math.nan]) * length
+    for name, column in table.items():
+        while len(column) < length:
+            column.append(math.nan)
+        column[row] = values.get(name, math.nan)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _describe(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return None
+    description = {'mean': float(values.mean()), 'min': float(values.min()), 'max': float(values.max())}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        description[f'p{percentile}'] = float(value)
+    return description
@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+
+
+class FrameDeduplicator:
+    """基于差值哈希(dHash)的近重复帧检测
+
+    UI录屏大部分时间是静止的，相邻采样帧往往几乎一样。
+    汉明距离不超过 threshold 的帧视为重复，复用代表帧的分析结果。
+    """
+
+    def __init__(self, threshold=5, hash_size=8):
+        self.threshold = threshold
+        self.hash_size = hash_size
+        self.representatives = []  # [(frame_id, hash)]
+        self.total = 0
+        self.duplicates = 0
+
+    def hash_frame(self, frame):
+        """计算帧的dHash，返回整数"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    def find_duplicate(self, frame_id, frame):
+        """返回与该帧近重复的代表帧ID；若不是重复帧，则将其登记为新的代表帧并返回None"""
+        self.total += 1
+        frame_hash = self.hash_frame(frame)
+        for representative_id, representative_hash in self.representatives:
+            if bin(frame_hash ^ representative_hash).count('1') <= self.threshold:
+                self.duplicates += 1
+                return representative_id
+        self.representatives.append((frame_id, frame_hash))
+        return None
+
+    @property
+    def dedup_ratio(self):
+        return self.duplicates / self.total if self.total else 0.0
+
+    def stats(self):
+        return {
+            "threshold": self.threshold,
+            "frames": self.total,
+            "unique_frames": self.total - self.duplicates,
+            "duplicate_frames": self.duplicates,
+            "dedup_ratio": self.dedup_ratio
+        }
@@ -0,0 +1,78 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from bs4 import BeautifulSoup, NavigableString
+from zss import Node
+
+# 与 TfidfVectorizer 默认的分词规则一致
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+INVISIBLE_TAGS = {'script', 'style', 'noscript', 'template', 'head', 'title', 'meta'}
+
+
+class ParsedDocument:
+    """只解析一次、供所有评估指标复用的HTML文档
+
+    包含标签序列、zss树、节点数、可见文本和词元序列。
+    通过 from_html 获取时按内容哈希缓存，同一份HTML不会重复解析。
+    """
+
+    _cache = OrderedDict()
+    _cache_size = 256
+    _lock = threading.Lock()
+
+    def __init__(self, html):
+        self.html = html
+        self.content_hash = content_hash(html)
+        soup = BeautifulSoup(html, 'html.parser')
+        self.tags = [tag.name for tag in soup.find_all()]
+        self.node_count = len(self.tags)
+        self.tree = self._create_tree(soup)
+        self.text = ' '.join(
+            text.strip() for text in soup.find_all(string=True)
+            if type(text) is NavigableString and text.strip()
+            and not INVISIBLE_TAGS.intersection(parent.name for parent in text.parents)
+        )
+        self.tokens = TOKEN_PATTERN.findall(html.lower())
+        self._features = {}
+        self._features_lock = threading.Lock()
+
+    @staticmethod
+    def _create_tree(element):
+        if element.name is None:
+            return Node(element.string or '')
+        children = [ParsedDocument._create_tree(child) for child in element.children if child.name is not None]
+        return Node(element.name, children)
+
+    def feature(self, name, builder):
+        """获取按需计算的派生特征（如MinHash签名），每个文档只计算一次"""
+        with self._features_lock:
+            if name in self._features:
+                return self._features[name]
+        value = builder(self)
+        with self._features_lock:
+            return self._features.setdefault(name, value)
+
+    @classmethod
+    def from_html(cls, html):
+        """获取HTML对应的解析结果，已解析过的内容直接返回缓存"""
+        if isinstance(html, ParsedDocument):
+            return html
+        key = content_hash(html)
+        with cls._lock:
+            document = cls._cache.get(key)
+            if document is not None:
+                cls._cache.move_to_end(key)
+                return document
+        document = cls(html)
+        with cls._lock:
+            cls._cache[key] = document
+            while len(cls._cache) > cls._cache_size:
+                cls._cache.popitem(last=False)
+        return document
+
+
+def content_hash(html):
+    """HTML内容的SHA-256哈希"""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
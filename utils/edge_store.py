@@ -0,0 +1,66 @@
+import json
+import os
+import numpy as np
+
+EDGE_DTYPE = np.int16
+EDGE_LIMIT = np.iinfo(EDGE_DTYPE).max
+
+
+def edges_to_array(edges):
+    """将边缘点转换为 int16 的 (N, 2) 数组，兼容 [{"x":..,"y":..}] 列表"""
+    if isinstance(edges, np.ndarray):
+        points = edges.reshape(-1, 2)
+    elif edges and isinstance(edges[0], dict):
+        points = np.array([(edge["x"], edge["y"]) for edge in edges])
+    else:
+        points = np.asarray(edges).reshape(-1, 2)
+    if points.size and points.max() > EDGE_LIMIT:
+        raise ValueError(f"边缘坐标超出 int16 范围: {points.max()}")
+    return points.astype(EDGE_DTYPE, copy=False)
+
+
+def save_edges(frames_edges, npy_path):
+    """把所有帧的边缘点拼接保存到一个 .npy 文件
+
+    返回每帧在 edges.json 中的引用: {"file", "offset", "count"}，
+    file 为相对于 .npy 所在目录的文件名
+    """
+    arrays = [edges_to_array(edges) for edges in frames_edges]
+    points = np.concatenate(arrays) if arrays else np.empty((0, 2), dtype=EDGE_DTYPE)
+    np.save(npy_path, points)
+
+    refs = []
+    offset = 0
+    for array in arrays:
+        refs.append({
+            "file": os.path.basename(npy_path),
+            "offset": offset,
+            "count": len(array)
+        })
+        offset += len(array)
+    return refs
+
+
+def load_edges_json(json_path, mmap=True):
+    """读取 edges.json，每帧的 edges 替换为 (N, 2) 数组
+
+    新格式从 .npy 旁路文件读取（默认内存映射，不复制数据），
+    旧格式（edges 为坐标字典列表）仍可读取
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    base_dir = os.path.dirname(json_path)
+    sidecars = {}
+    for frame in data.get("frames", []):
+        edges = frame.get("edges", [])
+        if isinstance(edges, dict):
+            file_name = edges["file"]
+            if file_name not in sidecars:
+                sidecars[file_name] = np.load(os.path.join(base_dir, file_name),
+                                              mmap_mode='r' if mmap else None)
+            points = sidecars[file_name]
+            frame["edges"] = points[edges["offset"]:edges["offset"] + edges["count"]]
+        else:
+            frame["edges"] = edges_to_array(edges)
+    return data
@@ -0,0 +1,111 @@
+import cv2
+import multiprocessing
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from utils.edge_store import edges_to_array
+
+# 与 cv2.circle(radius=2, thickness=-1) 形状一致的膨胀核
+EDGE_MARKER_KERNEL = cv2.circle(np.zeros((5, 5), np.uint8), (2, 2), 2, 1, -1)
+
+
+def detect_edge_points(frame):
+    """对图片进行边缘检测，返回 (N, 2) 的坐标数组"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, 100, 200)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if not contours:
+        return np.empty((0, 2), dtype=np.int32)
+    # 一次拼接所有轮廓点，避免逐点构建Python对象
+    return np.concatenate(contours).reshape(-1, 2)
+
+
+def detect_edges(frame):
+    """对图片进行边缘检测，返回 [{"x": int, "y": int}] 列表"""
+    return [{"x": x, "y": y} for x, y in detect_edge_points(frame).tolist()]
+
+
+def draw_edge_overlay(image, edges):
+    """在图片上用绿色圆点标出边缘点（掩码膨胀一次完成，不逐点绘制）"""
+    visualization = image.copy()
+    points = edges_to_array(edges)
+    if not len(points):
+        return visualization
+
+    height, width = image.shape[:2]
+    inside = ((points[:, 0] >= 0) & (points[:, 0] < width) &
+              (points[:, 1] >= 0) & (points[:, 1] < height))
+    points = points[inside]
+    mask = np.zeros((height, width), np.uint8)
+    mask[points[:, 1], points[:, 0]] = 1
+    mask = cv2.dilate(mask, EDGE_MARKER_KERNEL)
+    visualization[mask.astype(bool)] = (0, 255, 0)
+    return visualization
+
+
+def _detect_shared_frame(name, shape, dtype):
+    """子进程中：直接在共享内存中的帧上做边缘检测，帧数据不经过pickle"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        frame = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        points = detect_edge_points(frame)
+        # 关闭共享内存前必须释放对其缓冲区的引用
+        del frame
+        return points
+    finally:
+        block.close()
+
+
+def detect_edges_parallel(frames, workers=None):
+    """在进程池中对帧流进行边缘检测
+
+    frames 为 (frame_id, timestamp, frame) 的可迭代对象，
+    按输入顺序产出 (frame_id, timestamp, frame, edges)，edges 为坐标数组。
+    同时在途的帧最多为 workers * 2 个，不会把整个视频读入内存。
+    帧通过可复用的共享内存块传给子进程（每帧只复制一次），子进程只返回坐标数组。
+    """
+    workers = workers or multiprocessing.cpu_count()
+    if workers <= 1:
+        for frame_id, timestamp, frame in frames:
+            yield frame_id, timestamp, frame, detect_edge_points(frame)
+        return
+
+    # 解码线程仍在运行，使用spawn避免fork多线程进程
+    context = multiprocessing.get_context('spawn')
+    pending = deque()
+    free = []  # 结果已取回、可以复用的共享内存块
+    blocks = []
+
+    def acquire(size):
+        for index, block in enumerate(free):
+            if block.size >= size:
+                return free.pop(index)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        blocks.append(block)
+        return block
+
+    def result():
+        frame_id, timestamp, frame, block, future = pending.popleft()
+        edges = future.result()
+        free.append(block)
+        return frame_id, timestamp, frame, edges
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            for frame_id, timestamp, frame in frames:
+                frame = np.ascontiguousarray(frame)
+                block = acquire(frame.nbytes)
+                np.ndarray(frame.shape, dtype=frame.dtype, buffer=block.buf)[...] = frame
+                future = executor.submit(_detect_shared_frame, block.name, frame.shape, frame.dtype.str)
+                pending.append((frame_id, timestamp, frame, block, future))
+                if len(pending) >= workers * 2:
+                    yield result()
+            while pending:
+                yield result()
+    finally:
+        # 进程池退出时已等待所有在途任务，此时可以安全释放共享内存
+        for block in blocks:
+            block.close()
+            block.unlink()
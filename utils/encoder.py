@@ -0,0 +1,90 @@
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+
+class ImageEncoder:
+    """视觉调用前的图片编码层
+
+    支持按最长边缩放、质量设置、jpg/webp/png 格式选择，
+    并按图片内容哈希缓存编码结果。每次调用的字节数和耗时记录在 self.stats 中。
+    """
+
+    FORMATS = {
+        'jpg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+        'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+        'png': ('.png', None),
+    }
+
+    def __init__(self, max_dim=None, quality=95, fmt='jpg', cache_size=32):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"不支持的图片格式: {fmt}")
+        self.max_dim = max_dim  # 最长边像素上限，None 表示不缩放
+        self.quality = quality  # jpg/webp 质量 (0-100)
+        self.fmt = fmt
+        self.cache_size = cache_size
+        self.stats = []
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_key(self, image):
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+        digest.update(repr((image.shape, image.dtype.str)).encode())
+        return digest.hexdigest(), self.max_dim, self.quality, self.fmt
+
+    def _resize(self, image):
+        height, width = image.shape[:2]
+        if not self.max_dim or max(height, width) <= self.max_dim:
+            return image
+        scale = self.max_dim / max(height, width)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def encode_base64(self, image):
+        """编码图片并转为base64字符串"""
+        start = time.perf_counter()
+        key = self._cache_key(image)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        hit = cached is not None
+
+        if not hit:
+            extension, quality_flag = self.FORMATS[self.fmt]
+            params = [quality_flag, int(self.quality)] if quality_flag is not None else []
+            resized = self._resize(image)
+            ok, buffer = cv2.imencode(extension, resized, params)
+            if not ok:
+                raise Exception(f"图片编码失败: {self.fmt}")
+            cached = base64.b64encode(buffer).decode('utf-8'), len(buffer), resized.shape[:2]
+            with self._lock:
+                self._cache[key] = cached
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        base64_string, payload_bytes, (height, width) = cached
+        with self._lock:
+            self.stats.append({
+                "format": self.fmt,
+                "width": width,
+                "height": height,
+                "bytes": payload_bytes,
+                "base64_bytes": len(base64_string),
+                "encode_ms": (time.perf_counter() - start) * 1000,
+                "cached": hit
+            })
+        return base64_string
+
+    def summary(self):
+        """汇总编码统计"""
+        return {
+            "calls": len(self.stats),
+            "cache_hits": sum(1 for stat in self.stats if stat["cached"]),
+            "bytes": sum(stat["bytes"] for stat in self.stats),
+            "encode_ms": sum(stat["encode_ms"] for stat in self.stats)
+        }
@@ -1,35 +1,141 @@
-import difflib
-from bs4 import BeautifulSoup
+import copy
+import json
+import multiprocessing
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from zss import simple_distance, Node
+from utils.document import ParsedDocument, content_hash
+from utils.text_similarity import TextSimilarityEngine, jaccard_matrix
+from utils.tree_distance import TreeDistanceEngine
+from utils.metrics import EVALUATION_DURATION, EVALUATIONS
+from utils.tracing import tracer
 
 '''
 pip install beautifulsoup4 numpy scikit-learn zss
 '''
+
+
+def _identity(tokens):
+    return tokens
+
+
+# 子进程中的评估器，由进程池初始化函数设置，避免每个任务重复传递
+_worker_evaluator = None
+
+
+def _init_worker(evaluator):
+    global _worker_evaluator
+    _worker_evaluator = evaluator
+
+
+@contextmanager
+def _timed(metric, **args):
+    """同时记录追踪区间和各指标的耗时直方图"""
+    start = time.perf_counter()
+    with tracer.span(f'eval.{metric}', 'evaluate', **args) as span:
+        yield span
+    EVALUATION_DURATION.labels(metric=metric).observe(time.perf_counter() - start)
+
+
+def _compute_metrics_worker(html1, html2):
+    return _worker_evaluator._compute_metrics(html1, html2)
+
+
+class _EvaluationPool:
+    """评估用的进程池，子进程异常退出（OOM、段错误）导致进程池损坏时自动重建
+
+    进程池损坏时所有在途任务都会失败，无法知道是哪一对导致的，
+    因此每个任务在新进程池中重试一次；连续两次遇到进程池损坏的对记为该对的错误
+    """
+
+    def __init__(self, evaluator, jobs):
+        self.evaluator = evaluator
+        self.jobs = jobs
+        self.generation = 0
+        self.rebuilds = 0
+        self._executor = self._create()
+
+    def _create(self):
+        # 调用方可能有后台线程（如mock服务），使用spawn避免fork多线程进程
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=self.jobs, mp_context=context,
+                                   initializer=_init_worker, initargs=(self.evaluator,))
+
+    def _rebuild(self, generation):
+        # 同一次损坏只重建一次
+        if generation != self.generation:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._create()
+        self.generation += 1
+        self.rebuilds += 1
+        print(f"评估子进程异常退出，已重建进程池 (第 {self.rebuilds} 次)")
+
+    def _submit(self, html1, html2):
+        generation = self.generation
+        try:
+            return generation, self._executor.submit(_compute_metrics_worker, html1, html2)
+        except BrokenProcessPool:
+            self._rebuild(generation)
+            return self.generation, self._executor.submit(_compute_metrics_worker, html1, html2)
+
+    def submit(self, html1, html2):
+        """提交一对HTML，返回任务句柄 [html1, html2, 进程池代数, future, 已重试]"""
+        return [html1, html2, *self._submit(html1, html2), False]
+
+    def result(self, task):
+        """等待任务结果；进程池损坏时在新进程池中重试一次"""
+        while True:
+            html1, html2, generation, future, retried = task
+            try:
+                return future.result()
+            except BrokenProcessPool as e:
+                self._rebuild(generation)
+                if retried:
+                    raise BrokenProcessPool(f"评估子进程异常退出（重试后仍然失败）: {e}") from e
+                task[2:] = [*self._submit(html1, html2), True]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
 class HTMLEvaluator:
-    def __init__(self):
+    # 指标实现发生变化（会影响得分）时递增，使旧的指标缓存失效
+    METRICS_VERSION = 1
+
+    def __init__(self, tree_mode='auto', tree_cutoff=None, text_method='difflib', metrics_cache=None):
+        # 树距离: 节点数不超过 tree_cutoff 时精确计算，否则使用 pq-gram 近似（None 时按是否安装 apted 取默认值）
+        self.tree_engine = TreeDistanceEngine(tree_mode, tree_cutoff)
+        # 文本相似度: 默认 difflib，可选线性时间的 minhash/jaccard/lcs 或带上限的 bounded
+        self.text_engine = TextSimilarityEngine(text_method)
         self.weights = {
             'text_similarity': 0.25,
             'tag_similarity': 0.25,
             'tree_distance': 0.25,
             'vector_similarity': 0.25
         }
+        # 指标缓存（ResponseCache），键为两份HTML的内容哈希、指标版本和配置，不含权重
+        self.metrics_cache = metrics_cache
+    
+    @staticmethod
+    def parse(html):
+        """获取HTML的解析结果（ParsedDocument），同一内容只解析一次"""
+        return ParsedDocument.from_html(html)
     
     def calculate_text_similarity(self, html1, html2):
         """计算文本相似度"""
-        # 使用difflib计算文本相似度
-        similarity = difflib.SequenceMatcher(None, html1, html2).ratio()
-        return similarity
+        doc1, doc2 = self.parse(html1), self.parse(html2)
+        return self.text_engine.compute(doc1, doc2)
     
     def calculate_tag_similarity(self, html1, html2):
         """计算HTML标签相似度"""
-        soup1 = BeautifulSoup(html1, 'html.parser')
-        soup2 = BeautifulSoup(html2, 'html.parser')
-        
         # 获取所有标签
-        tags1 = [tag.name for tag in soup1.find_all()]
-        tags2 = [tag.name for tag in soup2.find_all()]
+        tags1 = self.parse(html1).tags
+        tags2 = self.parse(html2).tags
         
         # 计算标签集合的Jaccard相似度
         intersection = len(set(tags1) & set(tags2))
@@ -39,63 +145,161 @@ class HTMLEvaluator:
     
     def html_to_tree(self, html):
         """将HTML转换为树结构"""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        def create_tree(element):
-            if element.name is None:
-                return Node(element.string or '')
-            children = [create_tree(child) for child in element.children if child.name is not None]
-            return Node(element.name, children)
-        
-        return create_tree(soup)
+        return self.parse(html).tree
     
     def calculate_tree_distance(self, html1, html2):
-        """计算树编辑距离"""
-        tree1 = self.html_to_tree(html1)
-        tree2 = self.html_to_tree(html2)
-        
-        distance = simple_distance(tree1, tree2)
-        # 归一化距离值到0-1范围
-        max_nodes = max(len(BeautifulSoup(html1, 'html.parser').find_all()),
-                       len(BeautifulSoup(html2, 'html.parser').find_all()))
-        normalized_distance = 1 - (distance / (max_nodes * 2))
-        
-        return normalized_distance
+        """计算树编辑距离（归一化到0-1范围）"""
+        return self.tree_distance_details(html1, html2)['score']
+    
+    def tree_distance_details(self, html1, html2):
+        """计算树编辑距离，并标明结果是精确值还是近似值"""
+        doc1, doc2 = self.parse(html1), self.parse(html2)
+        return self.tree_engine.compute_documents(doc1, doc2)
     
     def calculate_vector_similarity(self, html1, html2):
         """计算向量相似度"""
-        vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform([html1, html2])
+        # sklearn 导入较慢，只在真正计算时导入（命中指标缓存时不需要）
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        # 词元序列已在解析时按 TfidfVectorizer 的默认规则切分
+        vectorizer = TfidfVectorizer(analyzer=_identity)
+        tfidf_matrix = vectorizer.fit_transform([self.parse(html1).tokens, self.parse(html2).tokens])
         
         # 计算余弦相似度
         # 修改这里：使用 toarray() 替代 A
         similarity = (tfidf_matrix * tfidf_matrix.T).toarray()[0,1]
         return similarity
     
-    def evaluate(self, html1, html2):
-        """综合评估HTML相似度"""
+    def config(self):
+        """影响指标数值的配置（权重只影响总分，不在其中）"""
+        text = self.text_engine
+        return {
+            'tree_mode': self.tree_engine.mode,
+            'tree_cutoff': self.tree_engine.cutoff,
+            'pq_gram': [self.tree_engine.p, self.tree_engine.q],
+            'text_method': text.method,
+            'text_params': [text.max_chars, text.shingle_size, text.num_perm, text.seed]
+        }
+
+    def metrics_key(self, html1, html2):
+        """指标缓存键：有序的内容哈希对 + 指标版本 + 配置"""
+        hash1, hash2 = (html.content_hash if isinstance(html, ParsedDocument) else content_hash(html)
+                        for html in (html1, html2))
+        return self.metrics_cache.make_key('metrics', self.METRICS_VERSION, hash1, hash2,
+                                           json.dumps(self.config(), sort_keys=True))
+
+    def compute_metrics(self, html1, html2):
+        """计算四项指标；启用指标缓存时，两份HTML都未改变则直接读取缓存（无需解析）"""
+        if self.metrics_cache is None:
+            return self._compute_metrics(html1, html2)
+        key = self.metrics_key(html1, html2)
+        with tracer.span('eval.cache_lookup', 'evaluate') as span:
+            result = self.metrics_cache.get(key)
+            span.set(hit=result is not None)
+        if result is None:
+            result = self._compute_metrics(html1, html2)
+            self.metrics_cache.set(key, result)
+        return result
+
+    def _compute_metrics(self, html1, html2):
+        # 每个文档只解析一次，各指标共享解析结果
+        with _timed('parse') as span:
+            doc1, doc2 = self.parse(html1), self.parse(html2)
+            span.set(bytes=len(doc1.html) + len(doc2.html))
+        
         # 计算各个指标
+        with _timed('tree_distance') as span:
+            tree_result = self.tree_distance_details(doc1, doc2)
+            span.set(method=tree_result['method'], algorithm=tree_result['algorithm'])
+        with _timed('text_similarity', method=self.text_engine.method):
+            text_similarity = float(self.calculate_text_similarity(doc1, doc2))
+        with _timed('tag_similarity'):
+            tag_similarity = float(self.calculate_tag_similarity(doc1, doc2))
+        with _timed('vector_similarity'):
+            vector_similarity = float(self.calculate_vector_similarity(doc1, doc2))
         metrics = {
-            'text_similarity': self.calculate_text_similarity(html1, html2),
-            'tag_similarity': self.calculate_tag_similarity(html1, html2),
-            'tree_distance': self.calculate_tree_distance(html1, html2),
-            'vector_similarity': self.calculate_vector_similarity(html1, html2)
+            'text_similarity': text_similarity,
+            'tag_similarity': tag_similarity,
+            'tree_distance': tree_result['score'],
+            'vector_similarity': vector_similarity
         }
-        
-        # 计算加权平均分数
+        return {
+            'metrics': metrics,
+            'tree_distance_method': {
+                'method': tree_result['method'],
+                'algorithm': tree_result['algorithm']
+            },
+            'text_similarity_method': self.text_engine.method
+        }
+
+    def score(self, result):
+        """按当前权重由各项指标计算总分"""
+        metrics = result['metrics']
         weighted_sum = sum(score * self.weights[metric] for metric, score in metrics.items())
         total_weight = sum(self.weights.values())
-        overall_score = weighted_sum / total_weight
-        
         return {
             'metrics': metrics,
-            'overall_score': overall_score
+            'overall_score': weighted_sum / total_weight,
+            'tree_distance_method': result['tree_distance_method'],
+            'text_similarity_method': result['text_similarity_method']
         }
+
+    def evaluate(self, html1, html2):
+        """综合评估HTML相似度"""
+        return self.score(self.compute_metrics(html1, html2))
     
+    def evaluate_many(self, htmls):
+        """一次计算多个HTML两两之间的全部指标（N×N 矩阵）
+
+        htmls 为 {名称: HTML} 字典或HTML列表。所有文档共用一次 TF-IDF 拟合，
+        向量相似度与标签相似度通过稀疏矩阵乘积一次算出；文本相似度按所选后端计算，
+        树距离逐对计算上三角。注意向量相似度的IDF来自全部N个文档，
+        与 evaluate 中两两拟合的数值不完全相同
+        """
+        if isinstance(htmls, dict):
+            names, htmls = list(htmls), list(htmls.values())
+        else:
+            names = [str(index) for index in range(len(htmls))]
+        with tracer.span('eval.parse', 'evaluate', documents=len(htmls)):
+            docs = [self.parse(html) for html in htmls]
+        count = len(docs)
+
+        # 向量相似度：TfidfVectorizer 输出已做L2归一化，X·Xᵀ 即余弦相似度矩阵
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vectorizer = TfidfVectorizer(analyzer=_identity)
+        tfidf_matrix = vectorizer.fit_transform([doc.tokens for doc in docs])
+        vector = (tfidf_matrix @ tfidf_matrix.T).toarray()
+
+        tree = np.eye(count)
+        tree_methods = {}
+        for i in range(count):
+            for j in range(i + 1, count):
+                result = self.tree_engine.compute_documents(docs[i], docs[j])
+                tree[i, j] = tree[j, i] = result['score']
+                tree_methods[result['method']] = tree_methods.get(result['method'], 0) + 1
+
+        metrics = {
+            'text_similarity': self.text_engine.matrix(docs),
+            'tag_similarity': jaccard_matrix([doc.tags for doc in docs], empty=0.0),
+            'tree_distance': tree,
+            'vector_similarity': vector
+        }
+        total_weight = sum(self.weights.values())
+        overall_score = sum(matrix * self.weights[metric] for metric, matrix in metrics.items()) / total_weight
+
+        return {
+            'names': names,
+            'metrics': metrics,
+            'overall_score': overall_score,
+            'tree_distance_methods': tree_methods,
+            'text_similarity_method': self.text_engine.method
+        }
+
     def generate_report(self, html1, html2):
         """生成详细的评估报告"""
-        results = self.evaluate(html1, html2)
-        
+        return self.build_report(self.evaluate(html1, html2))
+
+    def build_report(self, results):
+        """由 evaluate 的结果生成报告"""
         report = {
             'detailed_metrics': {
                 'HTML Text Similarity Score': results['metrics']['text_similarity'],
@@ -104,7 +308,73 @@ class HTMLEvaluator:
                 'HTML Vector Similarity Score': results['metrics']['vector_similarity']
             },
             'overall_score': results['overall_score'],
+            'tree_distance_method': results['tree_distance_method'],
+            'text_similarity_method': results['text_similarity_method'],
             'weights_used': self.weights
         }
         
         return report
+
+    def generate_reports(self, pairs, jobs=None):
+        """批量生成评估报告
+
+        pairs 为 (html1, html2) 列表，返回与 pairs 顺序一致的列表，
+        每项为报告字典；某一对评估失败时该项为对应的异常，不影响其余各对。
+        jobs > 1 时在进程池中并行计算（树距离和difflib是纯Python计算，线程无法加速），
+        进程数不超过CPU核数和待评估的对数
+        """
+        jobs = min(jobs or 1, len(pairs)) if pairs else 1
+        items = ((index, html1, html2) for index, (html1, html2) in enumerate(pairs))
+        return [result for _, result in self.iter_reports(items, jobs)]
+
+    def iter_reports(self, items, jobs=None):
+        """流式生成评估报告
+
+        items 为 (key, html1, html2) 的可迭代对象（可以是惰性生成器），
+        按输入顺序产出 (key, 报告字典或异常)。并行时同时在途的任务最多为 jobs * 2 个，
+        不会一次读入全部HTML；命中指标缓存的对不会提交给子进程
+        """
+        for key, report in self._iter_reports(items, jobs):
+            EVALUATIONS.labels(status='error' if isinstance(report, Exception) else 'ok').inc()
+            yield key, report
+
+    def _iter_reports(self, items, jobs):
+        jobs = min(jobs or 1, multiprocessing.cpu_count())
+        if jobs <= 1:
+            for key, html1, html2 in items:
+                try:
+                    yield key, self.generate_report(html1, html2)
+                except Exception as e:
+                    yield key, e
+            return
+
+        # 指标缓存在主进程中查询和写入，子进程只做计算
+        worker_evaluator = copy.copy(self)
+        worker_evaluator.metrics_cache = None
+        pool = _EvaluationPool(worker_evaluator, jobs)
+        pending = deque()
+        try:
+            for key, html1, html2 in items:
+                cache_key = cached = None
+                if self.metrics_cache is not None:
+                    cache_key = self.metrics_key(html1, html2)
+                    cached = self.metrics_cache.get(cache_key)
+                task = None if cached is not None else pool.submit(html1, html2)
+                pending.append((key, task, cached, cache_key))
+                if len(pending) >= jobs * 2:
+                    yield self._collect(pool, *pending.popleft())
+            while pending:
+                yield self._collect(pool, *pending.popleft())
+        finally:
+            pool.shutdown()
+
+    def _collect(self, pool, key, task, cached, cache_key):
+        if task is None:
+            return key, self.build_report(self.score(cached))
+        try:
+            result = pool.result(task)
+        except Exception as e:
+            return key, e
+        if cache_key is not None:
+            self.metrics_cache.set(cache_key, result)
+        return key, self.build_report(self.score(result))
@@ -0,0 +1,116 @@
+import os
+import string
+import time
+
+
+# 输出末尾可能属于结尾代码块标记的字符
+_TAIL_CHARS = string.whitespace + '`'
+
+
+class FenceStripper:
+    """流式去除LLM输出外层的 markdown 代码块标记
+
+    开头的 ```html 行直接丢弃；末尾由空白和反引号组成的部分先暂存，
+    直到后面出现其它字符（说明它不是结尾的 ```）为止，其余内容立即输出。
+    输出只取决于完整文本，与分片方式无关，与 strip_code_fences 的结果一致。
+    """
+
+    def __init__(self):
+        self.started = False
+        self.pending = ""
+
+    def feed(self, chunk):
+        """输入一段文本，返回可以立即写出的部分"""
+        self.pending += chunk
+        if not self.started:
+            head = self.pending.lstrip()
+            if head.startswith('```'):
+                newline = head.find('\n')
+                if newline < 0:
+                    return ""
+                self.pending = head[newline + 1:]
+            elif len(head) < 3 and '```'.startswith(head):
+                return ""
+            self.started = True
+        return self._flush()
+
+    def _flush(self):
+        keep = len(self.pending.rstrip(_TAIL_CHARS))
+        output, self.pending = self.pending[:keep], self.pending[keep:]
+        return output
+
+    def finish(self):
+        """输入结束，返回剩余内容（去掉结尾的 ``` 及其前后的空白，无论它是否独占一行）"""
+        rest, self.pending = self.pending, ""
+        if not self.started:
+            rest = rest.lstrip()
+            if rest.startswith('```'):
+                # 只有开头的代码块标记行
+                return ""
+        rest = rest.rstrip()
+        if rest.endswith('```'):
+            rest = rest.rstrip('`').rstrip()
+        return rest
+
+
+class StreamCancelled(Exception):
+    """流式接收被调用方取消（例如已超时）"""
+
+
+def strip_code_fences(text):
+    """一次性去除完整输出外层的 markdown 代码块标记（非流式调用使用）"""
+    stripper = FenceStripper()
+    return stripper.feed(text) + stripper.finish()
+
+
+def stream_to_file(chunks, path, start=None, cancel=None):
+    """把流式输出边接收边写入文件，返回内容与延迟统计
+
+    start 为发出请求的时间点(perf_counter)，默认为开始读取的时间。
+    tokens 按收到的增量片段数计（SSE 下通常一个片段对应一个token）。
+    cancel 为 threading.Event，被设置后停止接收、关闭连接并删除写了一半的文件，
+    抛出 StreamCancelled；接收中途出错时同样删除文件
+    """
+    stripper = FenceStripper()
+    parts = []
+    start = start or time.perf_counter()
+    first_token = None
+    token_count = 0
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                if cancel is not None and cancel.is_set():
+                    raise StreamCancelled(f"已取消: {path}")
+                if not chunk:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter()
+                token_count += 1
+                text = stripper.feed(chunk)
+                if text:
+                    f.write(text)
+                    f.flush()
+                    parts.append(text)
+            text = stripper.finish()
+            f.write(text)
+            parts.append(text)
+    except BaseException:
+        # 关闭生成器以释放底层的HTTP连接
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    end = time.perf_counter()
+
+    first_token = first_token or end
+    generation_time = end - first_token
+    return ''.join(parts), {
+        "ttft_ms": (first_token - start) * 1000,
+        "total_ms": (end - start) * 1000,
+        "tokens": token_count,
+        "tokens_per_sec": token_count / generation_time if token_count > 1 and generation_time > 0 else None
+    }
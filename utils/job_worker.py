@@ -0,0 +1,322 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.metrics import WORKER_JOB_DURATION, WORKER_JOBS, WORKER_JOBS_QUEUED, WORKER_JOBS_RUNNING
+
+JOB_MODES = ('full', 'ablation', 'both', 'evaluate')
+SPOOL_DIRS = ('incoming', 'running', 'done', 'failed', 'status')
+
+
+def _write_json(path, data):
+    """先写临时文件再原子替换，读取方不会看到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def validate_job(job):
+    """检查任务字段，返回规范化后的任务；缺少 video/output 或模式不合法时抛出 ValueError"""
+    if not isinstance(job, dict):
+        raise ValueError("任务必须是JSON对象")
+    mode = job.get('mode', 'both')
+    if mode not in JOB_MODES:
+        raise ValueError(f"未知的任务模式: {mode} (可选: {', '.join(JOB_MODES)})")
+    if not job.get('output'):
+        raise ValueError("任务缺少 output")
+    if mode != 'evaluate' and not job.get('video'):
+        raise ValueError("任务缺少 video")
+    return {'video': job.get('video'), 'output': job['output'], 'mode': mode}
+
+
+class JobWorker:
+    """常驻进程的任务调度：从 spool 目录领取任务，在线程池中最多同时运行 max_jobs 个
+
+    spool 目录结构:
+    - incoming/<id>.json             待处理的任务 {"video": ..., "output": ..., "mode": ...}
+    - running/<id>@<主机>@<pid>.json  已被领取（通过原子 rename 领取，文件名记录领取者，
+                                     多个 worker 可以共享同一个 spool）
+    - done/、failed/                 处理完成或失败的任务
+    - status/<id>.json               每个任务的状态文件（queued/running/done/failed、时间、错误、结果摘要）
+
+    运行中的任务文件由领取者定期更新修改时间（心跳）。recover() 只把领取者已退出的任务放回
+    incoming/：同一主机上按 pid 判断进程是否存活，其它主机上按心跳是否超过 stale_after 秒判断。
+
+    runner(job) 在工作线程中执行任务并返回可JSON序列化的结果摘要，
+    模型/客户端等在进程启动时加载一次，所有任务共用
+    """
+
+    def __init__(self, runner, spool_dir='spool', max_jobs=2, poll_interval=1.0, on_job_finished=None,
+                 stale_after=None):
+        self.runner = runner
+        self.spool_dir = spool_dir
+        self.max_jobs = max(1, max_jobs)
+        self.poll_interval = poll_interval
+        self.on_job_finished = on_job_finished
+        self.stale_after = stale_after or max(60.0, 10 * poll_interval)
+        self.host = socket.gethostname()
+        self.pid = os.getpid()
+        self.stats = {'done': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._server = None
+        for name in SPOOL_DIRS:
+            os.makedirs(self._dir(name), exist_ok=True)
+
+    @property
+    def owner(self):
+        return f'{self.host}@{self.pid}'
+
+    def _dir(self, name):
+        return os.path.join(self.spool_dir, name)
+
+    def _path(self, name, job_id):
+        return os.path.join(self._dir(name), f'{job_id}.json')
+
+    def _running_path(self, job_id):
+        return self._path('running', f'{job_id}@{self.owner}')
+
+    def submit(self, job):
+        """提交任务（写入 incoming/），返回状态"""
+        job = validate_job(job)
+        # 时间前缀保证按提交顺序领取
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        status = dict(job, id=job_id, state='queued', submitted_at=time.time())
+        self._write_status(status)
+        _write_json(self._path('incoming', job_id), job)
+        self._wakeup.set()
+        return status
+
+    def status(self, job_id):
+        """读取任务状态，不存在时返回 None"""
+        if os.path.basename(job_id) != job_id:
+            return None
+        try:
+            return _read_json(self._path('status', job_id))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def counts(self):
+        return {name: len(self._job_ids(name)) for name in ('incoming', 'running', 'done', 'failed')}
+
+    def _write_status(self, status):
+        _write_json(self._path('status', status['id']), status)
+
+    def _job_ids(self, name):
+        return sorted(os.path.splitext(filename)[0] for filename in os.listdir(self._dir(name))
+                      if filename.endswith('.json'))
+
+    def _running_entries(self):
+        """running/ 中的任务，返回 [(文件名去掉扩展名, job_id, 主机, pid)]，无法解析领取者的 pid 为 None"""
+        entries = []
+        for name in self._job_ids('running'):
+            parts = name.rsplit('@', 2)
+            if len(parts) == 3 and parts[2].isdigit():
+                entries.append((name, parts[0], parts[1], int(parts[2])))
+            else:
+                entries.append((name, name, None, None))
+        return entries
+
+    def _owner_alive(self, host, pid, path):
+        if host == self.host and pid is not None:
+            if pid == self.pid:
+                return True
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                return True
+            return True
+        # 其它主机（或旧格式、没有领取者信息的文件）只能看心跳
+        try:
+            return time.time() - os.path.getmtime(path) < self.stale_after
+        except FileNotFoundError:
+            return True
+
+    def recover(self):
+        """把领取者已退出的 running/ 任务放回 incoming/，返回数量；其它存活 worker 的任务不受影响"""
+        recovered = 0
+        for name, job_id, host, pid in self._running_entries():
+            path = self._path('running', name)
+            if self._owner_alive(host, pid, path):
+                continue
+            try:
+                os.rename(path, self._path('incoming', job_id))
+                recovered += 1
+            except FileNotFoundError:
+                continue
+        return recovered
+
+    def _heartbeat(self):
+        """更新本进程领取的任务文件的修改时间"""
+        suffix = f'@{self.owner}'
+        for name in self._job_ids('running'):
+            if name.endswith(suffix):
+                try:
+                    os.utime(self._path('running', name))
+                except FileNotFoundError:
+                    continue
+
+    def _claim(self, limit):
+        """按 id 顺序领取最多 limit 个任务，返回 [(job_id, 运行中的任务文件路径)]"""
+        claimed = []
+        job_ids = self._job_ids('incoming')
+        for job_id in job_ids:
+            if len(claimed) >= limit:
+                break
+            running_path = self._running_path(job_id)
+            try:
+                os.rename(self._path('incoming', job_id), running_path)
+            except FileNotFoundError:
+                # 已被其它 worker 领取
+                continue
+            claimed.append((job_id, running_path))
+        WORKER_JOBS_QUEUED.set(len(job_ids) - len(claimed))
+        return claimed
+
+    def _execute(self, job_id, job_path):
+        status = {'id': job_id}
+        start = time.perf_counter()
+        mode = 'unknown'
+        WORKER_JOBS_RUNNING.inc()
+        try:
+            status = self.status(job_id) or {'id': job_id, 'submitted_at': os.path.getmtime(job_path)}
+            status.update(state='running', started_at=time.time(), error=None, worker=self.owner)
+            job = validate_job(_read_json(job_path))
+            mode = job['mode']
+            status.update(job)
+            self._write_status(status)
+            status['result'] = self.runner(dict(job, id=job_id))
+            status['state'] = 'done'
+        except Exception as e:
+            status['state'] = 'failed'
+            status['error'] = f"{type(e).__name__}: {e}"
+        finally:
+            WORKER_JOBS_RUNNING.dec()
+        duration = time.perf_counter() - start
+        status.update(finished_at=time.time(), duration_s=round(duration, 3))
+        with self._stats_lock:
+            self.stats[status['state']] += 1
+        WORKER_JOBS.labels(mode=mode, status=status['state']).inc()
+        WORKER_JOB_DURATION.labels(mode=mode).observe(duration)
+        print(f"任务 {job_id} {status['state']} ({mode}, {duration:.1f}s)"
+              + (f": {status['error']}" if status['error'] else ''))
+        # 收尾在工作线程中进行，没有人读取 future 的结果，出错时必须在这里打印
+        try:
+            self._write_status(status)
+            os.replace(job_path, self._path(status['state'], job_id))
+        except OSError as e:
+            print(f"任务 {job_id} 收尾失败: {type(e).__name__}: {e}")
+        if self.on_job_finished is not None:
+            try:
+                self.on_job_finished(status)
+            except Exception as e:
+                print(f"任务 {job_id} 完成回调失败: {type(e).__name__}: {e}")
+        # 空出一个并发名额，立即领取下一个任务
+        self._wakeup.set()
+        return status
+
+    def run(self, drain=False):
+        """处理任务直到 stop()；drain=True 时在 spool 为空且没有运行中的任务时退出"""
+        recovered = self.recover()
+        if recovered:
+            print(f"恢复了 {recovered} 个领取者已退出的任务")
+        running = set()
+        last_check = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix='job') as executor:
+            while not self._stop.is_set():
+                running = {future for future in running if not future.done()}
+                if time.monotonic() - last_check >= self.stale_after / 2:
+                    last_check = time.monotonic()
+                    self._heartbeat()
+                    recovered = self.recover()
+                    if recovered:
+                        print(f"恢复了 {recovered} 个领取者已退出的任务")
+                claimed = self._claim(self.max_jobs - len(running))
+                for job_id, job_path in claimed:
+                    running.add(executor.submit(self._execute, job_id, job_path))
+                if drain and not running and not claimed and not self._job_ids('incoming'):
+                    break
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+            # 停止时不再领取新任务，等待运行中的任务完成（期间继续心跳）
+            while running:
+                running = wait(running, timeout=self.stale_after / 2).not_done
+                self._heartbeat()
+        return self.stats
+
+    def stop(self):
+        """请求停止（可在信号处理函数中调用），run() 等待运行中的任务完成后返回"""
+        self._stop.set()
+        self._wakeup.set()
+
+    def close(self):
+        """关闭HTTP接口"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve(self, port, host='127.0.0.1'):
+        """在后台线程中提供HTTP接口，返回实际监听的端口
+
+        - POST /jobs        提交任务，返回 202 和状态
+        - GET /jobs/<id>    查询任务状态
+        - GET /jobs         各目录中的任务数
+        """
+        worker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, code, data):
+                body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if self.path.rstrip('/') != '/jobs':
+                    self._send(404, {'error': 'not found'})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    status = worker.submit(json.loads(self.rfile.read(length) or b'null'))
+                except (ValueError, json.JSONDecodeError) as e:
+                    self._send(400, {'error': str(e)})
+                    return
+                self._send(202, status)
+
+            def do_GET(self):
+                path = self.path.split('?')[0].rstrip('/')
+                if path == '/jobs':
+                    self._send(200, worker.counts())
+                    return
+                if path.startswith('/jobs/'):
+                    status = worker.status(path[len('/jobs/'):])
+                    if status is not None:
+                        self._send(200, status)
+                        return
+                self._send(404, {'error': 'not found'})
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='job-server', daemon=True).start()
+        return self._server.server_address[1]
@@ -0,0 +1,125 @@
+import json
+import cv2
+import numpy as np
+
+
+class LayoutExtractor:
+    """从UI截图中提取组件包围盒并组织成行/列布局树
+
+    沿用 edge_convert.main 的 Otsu 二值化 + findContours + boundingRect 思路，
+    先膨胀合并相邻的轮廓，再按投影间隙递归切分(XY-cut)得到布局树。
+    """
+
+    def __init__(self, merge_gap=8, min_area=400, max_boxes=60):
+        self.merge_gap = merge_gap  # 间距小于该值的元素合并为一个组件
+        self.min_area = min_area  # 忽略面积过小的噪点
+        self.max_boxes = max_boxes  # 最多保留的组件数（按面积）
+
+    def extract_boxes(self, image):
+        """提取组件包围盒，返回 [(x, y, w, h)]"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        # Otsu 可能把背景判为前景，此时反转
+        if np.count_nonzero(binary) > binary.size / 2:
+            binary = cv2.bitwise_not(binary)
+
+        if self.merge_gap > 0:
+            kernel = np.ones((self.merge_gap, self.merge_gap), np.uint8)
+            binary = cv2.dilate(binary, kernel)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        boxes = [cv2.boundingRect(contour) for contour in contours]
+        # 去掉膨胀带来的外扩
+        pad = self.merge_gap // 2
+        boxes = [(x + pad, y + pad, max(1, w - 2 * pad), max(1, h - 2 * pad)) for x, y, w, h in boxes]
+        boxes = self._merge_overlapping(boxes)
+        boxes = [box for box in boxes if box[2] * box[3] >= self.min_area]
+        boxes.sort(key=lambda box: box[2] * box[3], reverse=True)
+        return boxes[:self.max_boxes]
+
+    def _merge_overlapping(self, boxes):
+        """合并相互重叠的包围盒，直到没有重叠"""
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for box in boxes:
+                for i, other in enumerate(result):
+                    if (box[0] < other[0] + other[2] and other[0] < box[0] + box[2] and
+                            box[1] < other[1] + other[3] and other[1] < box[1] + box[3]):
+                        result[i] = _union(box, other)
+                        merged = True
+                        break
+                else:
+                    result.append(box)
+            boxes = result
+        return boxes
+
+    def build_tree(self, boxes):
+        """按行/列递归切分包围盒，返回布局树
+
+        节点类型: row（子节点水平排列）、column（子节点垂直排列）、box（单个组件）
+        """
+        if not boxes:
+            return None
+        if len(boxes) == 1:
+            return {"type": "box", "bbox": list(boxes[0])}
+
+        # 先按垂直方向切成多行，切不开再按水平方向切成多列
+        for axis, node_type in ((1, "column"), (0, "row")):
+            groups = _split(boxes, axis)
+            if len(groups) > 1:
+                return {
+                    "type": node_type,
+                    "bbox": list(_union_all(boxes)),
+                    "children": [self.build_tree(group) for group in groups]
+                }
+        # 互相交错无法切分的组件作为一组
+        return {
+            "type": "group",
+            "bbox": list(_union_all(boxes)),
+            "children": [{"type": "box", "bbox": list(box)} for box in boxes]
+        }
+
+    def extract(self, image):
+        """提取布局，返回可直接放入提示词的字典"""
+        height, width = image.shape[:2]
+        boxes = self.extract_boxes(image)
+        return {
+            "width": width,
+            "height": height,
+            "components": len(boxes),
+            "tree": self.build_tree(boxes)
+        }
+
+    @staticmethod
+    def to_json(layout):
+        """紧凑的JSON表示，用于HTML生成提示词"""
+        return json.dumps(layout, separators=(',', ':'))
+
+
+def _union(a, b):
+    x1, y1 = min(a[0], b[0]), min(a[1], b[1])
+    x2, y2 = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+def _union_all(boxes):
+    result = boxes[0]
+    for box in boxes[1:]:
+        result = _union(result, box)
+    return result
+
+
+def _split(boxes, axis):
+    """按 axis 方向的投影间隙分组（axis=0 为x方向，1 为y方向）"""
+    ordered = sorted(boxes, key=lambda box: box[axis])
+    groups = [[ordered[0]]]
+    end = ordered[0][axis] + ordered[0][axis + 2]
+    for box in ordered[1:]:
+        if box[axis] >= end:
+            groups.append([box])
+        else:
+            groups[-1].append(box)
+        end = max(end, box[axis] + box[axis + 2])
+    return groups
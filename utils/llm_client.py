@@ -0,0 +1,384 @@
+import base64
+import json
+import random
+import threading
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 图片输入按固定token数估算，用于TPM限流
+IMAGE_TOKEN_ESTIMATE = 1000
+
+# ImageEncoder 支持的格式（jpg/webp/png）的文件头
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'RIFF', 'image/webp'),
+)
+
+
+def image_mime_type(image_base64):
+    """按base64图片的文件头判断MIME类型，无法识别时按jpeg处理"""
+    # 16个base64字符解码为12字节，足够覆盖各格式的文件头
+    header = base64.b64decode(image_base64[:16])
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            if mime_type == 'image/webp' and header[8:12] != b'WEBP':
+                continue
+            return mime_type
+    return 'image/jpeg'
+
+
+class LLMHTTPError(Exception):
+    """LLM服务返回的HTTP错误"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：容量为每分钟配额，按匀速补充"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """取出 amount 个令牌，不足时阻塞等待"""
+        # 单次请求超过桶容量时按整桶计算，避免永远等不到
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """按每分钟请求数(RPM)和每分钟token数(TPM)限流"""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, tokens):
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(tokens)
+
+
+class RetryPolicy:
+    """429/5xx 时按带抖动的指数退避重试"""
+
+    def __init__(self, max_retries=4, base_delay=1.0, max_delay=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def status_of(error):
+        """从异常中取HTTP状态码，兼容常见SDK的异常属性"""
+        for attr in ('status', 'status_code', 'http_status'):
+            status = getattr(error, attr, None)
+            if isinstance(status, int):
+                return status
+        response = getattr(error, 'response', None)
+        return getattr(response, 'status_code', None)
+
+    def is_retryable(self, error):
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        status = self.status_of(error)
+        return status is not None and (status == 429 or status >= 500)
+
+    @staticmethod
+    def parse_retry_after(value):
+        """解析 Retry-After（秒数或HTTP日期），返回等待秒数；无法解析时返回 None"""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass
+        try:
+            retry_at = parsedate_to_datetime(str(value))
+        except (TypeError, ValueError, IndexError):
+            return None
+        if retry_at is None:
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def delay(self, attempt, error=None):
+        """第 attempt 次重试前的等待秒数（full jitter），优先遵守 Retry-After"""
+        retry_after = self.parse_retry_after(getattr(error, 'retry_after', None))
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func):
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                time.sleep(self.delay(attempt, e))
+                attempt += 1
+
+
+class LLMUtilBackend:
+    """使用项目原有的 LLMUtil 发送请求"""
+
+    def __init__(self, llm_util=None):
+        if llm_util is None:
+            from llm_util import LLMUtil
+            llm_util = LLMUtil()
+        self.llm_util = llm_util
+        self.model = getattr(llm_util, 'model', None) or type(llm_util).__name__
+
+    def native_chat(self, prompt):
+        return self.llm_util.native_chat(prompt)
+
+    def analyze_image_base64(self, prompt, image_base64):
+        return self.llm_util.analyze_image_base64(prompt, image_base64)
+
+    def stream_chat(self, prompt):
+        """LLMUtil 支持 stream_chat 时流式返回，否则整段作为一个片段返回"""
+        if hasattr(self.llm_util, 'stream_chat'):
+            return iter(self.llm_util.stream_chat(prompt))
+        return iter([self.llm_util.native_chat(prompt)])
+
+
+class HTTPBackend:
+    """OpenAI兼容的 /chat/completions 接口，使用保持连接的连接池"""
+
+    def __init__(self, base_url, model, api_key=None, pool_size=10, timeout=300):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+        self.server = None  # mock 后端对应的本地服务
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def _post(self, content, stream=False):
+        payload = {"model": self.model, "messages": [{"role": "user", "content": content}]}
+        if stream:
+            payload["stream"] = True
+        response = self.session.post(f"{self.base_url}/chat/completions", json=payload,
+                                     timeout=self.timeout, stream=stream)
+        if response.status_code >= 400:
+            raise LLMHTTPError(response.status_code, response.text[:200],
+                               response.headers.get('Retry-After'))
+        if stream:
+            return response
+        return response.json()["choices"][0]["message"]["content"]
+
+    def native_chat(self, prompt):
+        return self._post(prompt)
+
+    def analyze_image_base64(self, prompt, image_base64):
+        return self._post([
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": {"url": f"data:{image_mime_type(image_base64)};base64,{image_base64}"}}
+        ])
+
+    def stream_chat(self, prompt):
+        """发起流式请求（SSE），请求成功后返回逐段产出文本的迭代器"""
+        response = self._post(prompt, stream=True)
+
+        def chunks():
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {})
+                    if delta.get("content"):
+                        yield delta["content"]
+
+        return chunks()
+
+    def close(self):
+        self.session.close()
+        if self.server is not None:
+            self.server.stop()
+
+
+class LLMClient:
+    """统一的LLM客户端：后端可替换，调用前限流，失败时按策略重试
+
+    对外提供与 LLMUtil 相同的 native_chat / analyze_image_base64 接口，
+    可在多个线程间共享。
+    """
+
+    def __init__(self, backend, rate_limiter=None, retry_policy=None):
+        self.backend = backend
+        self.model = backend.model
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    @staticmethod
+    def estimate_tokens(prompt, with_image=False):
+        return len(prompt) // 4 + (IMAGE_TOKEN_ESTIMATE if with_image else 0)
+
+    def _call(self, tokens, func):
+        def attempt():
+            self.rate_limiter.acquire(tokens)
+            return func()
+        return self.retry_policy.call(attempt)
+
+    def native_chat(self, prompt):
+        return self._call(self.estimate_tokens(prompt),
+                          lambda: self.backend.native_chat(prompt))
+
+    def analyze_image_base64(self, prompt, image_base64):
+        return self._call(self.estimate_tokens(prompt, with_image=True),
+                          lambda: self.backend.analyze_image_base64(prompt, image_base64))
+
+    def stream_chat(self, prompt):
+        """流式对话，返回文本片段迭代器；只在建立连接阶段限流和重试"""
+        return self._call(self.estimate_tokens(prompt),
+                          lambda: self.backend.stream_chat(prompt))
+
+    def close(self):
+        if hasattr(self.backend, 'close'):
+            self.backend.close()
+
+
+class MockLLMServer:
+    """本地模拟的OpenAI兼容服务，用于离线运行和测试
+
+    文本请求返回一个最小的HTML页面（支持 stream=true 的SSE输出），图片请求返回固定格式的分析文本。
+    fail_every > 0 时每 fail_every 个请求返回一次429（带 Retry-After: retry_after 秒），用于验证重试。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_every=0, retry_after=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # 支持keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    server.requests += 1
+                    count = server.requests
+                if server.fail_every and count % server.fail_every == 0:
+                    self._send(429, {"error": {"message": "rate limited"}}, {'Retry-After': str(server.retry_after)})
+                    return
+                time.sleep(server.latency)
+                request = json.loads(body)
+                reply = server.respond(request["messages"][-1]["content"])
+                if request.get("stream"):
+                    self._send_stream(reply)
+                    return
+                self._send(200, {
+                    "model": "mock",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}}]
+                })
+
+            def _send_stream(self, reply):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                pieces = [reply[i:i + 16] for i in range(0, len(reply), 16)]
+                events = [{"choices": [{"index": 0, "delta": {"content": piece}}]} for piece in pieces]
+                for event in [json.dumps(event) for event in events] + ['[DONE]']:
+                    data = f"data: {event}\n\n".encode('utf-8')
+                    self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    @staticmethod
+    def respond(content):
+        if isinstance(content, list):
+            text = next((part["text"] for part in content if part.get("type") == "text"), "")
+            return f"Mock UI analysis ({len(text)} prompt chars): header, navigation, content cards, footer."
+        return ("<!DOCTYPE html>\n<html lang=\"en\">\n<head><meta charset=\"UTF-8\"><title>Mock UI</title></head>\n"
+                f"<body><main><h1>Mock UI</h1><p>Prompt length: {len(content)}</p>"
+                "<img src=\"frame.jpg\" alt=\"frame\"></main></body>\n</html>")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-llm', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def create_llm_client(backend='llmutil', base_url=None, model=None, api_key=None,
+                      rpm=None, tpm=None, max_retries=4, pool_size=10):
+    """按配置创建 LLMClient
+
+    backend: 'llmutil'（原有LLMUtil）、'http'（OpenAI兼容接口）或 'mock'（启动本地模拟服务）
+    """
+    if backend == 'llmutil':
+        client_backend = LLMUtilBackend()
+    elif backend == 'http':
+        if not base_url or not model:
+            raise ValueError("http 后端需要 base_url 和 model")
+        client_backend = HTTPBackend(base_url, model, api_key, pool_size)
+    elif backend == 'mock':
+        server = MockLLMServer().start()
+        client_backend = HTTPBackend(server.url, model or 'mock', pool_size=pool_size)
+        client_backend.server = server
+    else:
+        raise ValueError(f"不支持的LLM后端: {backend}")
+    return LLMClient(client_backend, RateLimiter(rpm, tpm), RetryPolicy(max_retries))
@@ -0,0 +1,303 @@
+import bisect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 秒级耗时的默认分桶（覆盖毫秒级的评估指标到分钟级的LLM调用）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _init_default(self):
+        # 不带标签的指标从一开始就输出 0，而不是在第一次更新前缺失
+        if not self.label_names:
+            self.labels()
+
+    def labels(self, **labels):
+        """取得某组标签值对应的子指标"""
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} 需要标签 {self.label_names}，实际为 {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _default(self):
+        if self.label_names:
+            raise ValueError(f"{self.name} 带标签，需先调用 labels()")
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.label_names, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, label_names, key):
+        return [f"{name}{_format_labels(label_names, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """单调递增的计数器"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._init_default()
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def render(self, name, label_names, key):
+        return [f"{name}{_format_labels(label_names, key)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """可增可减的当前值（如排队/运行中的任务数）"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._init_default()
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def render(self, name, label_names, key):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(label_names, key, [('le', _format_value(float(bound)))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(label_names, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    """分桶直方图（累计计数 + 总和 + 次数）"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._init_default()
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+
+class MetricsRegistry:
+    """指标注册表，输出 Prometheus 文本格式（text/plain; version=0.0.4）"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已注册: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """写入 node_exporter textfile collector 使用的 .prom 文件（先写临时文件再原子替换）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        return path
+
+    def serve(self, port, host='127.0.0.1'):
+        """在后台线程中通过 HTTP 提供 /metrics，返回实际监听的端口"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# 全局注册表与流水线使用的指标
+registry = MetricsRegistry()
+
+FRAMES_RETRIEVED = registry.counter(
+    'ui2html_frames_retrieved_total', 'Video frames converted to BGR images')
+FRAMES_KEPT = registry.counter(
+    'ui2html_frames_kept_total', 'Sampled frames kept for analysis')
+FRAMES_DEDUPLICATED = registry.counter(
+    'ui2html_frames_deduplicated_total', 'Sampled frames that reused an earlier frame analysis')
+EDGE_POINTS = registry.histogram(
+    'ui2html_edge_points', 'Edge points detected per analysed frame', buckets=COUNT_BUCKETS)
+LLM_CALLS = registry.counter(
+    'ui2html_llm_calls_total', 'LLM and vision calls', labels=('call', 'strategy', 'status'))
+LLM_LATENCY = registry.histogram(
+    'ui2html_llm_call_duration_seconds', 'LLM and vision call latency', labels=('call', 'strategy'))
+CACHE_REQUESTS = registry.counter(
+    'ui2html_cache_requests_total', 'On-disk cache lookups', labels=('cache', 'result'))
+EVALUATION_DURATION = registry.histogram(
+    'ui2html_evaluation_duration_seconds', 'Evaluation time per metric and per pair', labels=('metric',))
+EVALUATIONS = registry.counter(
+    'ui2html_evaluations_total', 'Evaluated HTML pairs', labels=('status',))
+OUTPUT_BYTES = registry.counter(
+    'ui2html_output_bytes_total', 'Bytes written to output files', labels=('kind',))
+WORKER_JOBS = registry.counter(
+    'ui2html_worker_jobs_total', 'Jobs finished by the worker', labels=('mode', 'status'))
+WORKER_JOB_DURATION = registry.histogram(
+    'ui2html_worker_job_duration_seconds', 'Worker job run time', labels=('mode',))
+WORKER_JOBS_RUNNING = registry.gauge(
+    'ui2html_worker_jobs_running', 'Jobs currently running in the worker')
+WORKER_JOBS_QUEUED = registry.gauge(
+    'ui2html_worker_jobs_queued', 'Jobs waiting in the spool directory')
+
+
+@contextmanager
+def llm_call(call, strategy):
+    """统计一次LLM/视觉调用的次数（按成功/失败）和耗时"""
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        LLM_CALLS.labels(call=call, strategy=strategy, status=status).inc()
+        LLM_LATENCY.labels(call=call, strategy=strategy).observe(time.perf_counter() - start)
@@ -1,17 +1,25 @@
 import cv2
 import numpy as np
-from llm_util import LLMUtil
-import base64
+from utils.edges import draw_edge_overlay
+from utils.encoder import ImageEncoder
+from utils.concurrency import run_concurrently
+from utils.llm_client import create_llm_client
+from utils.tracing import tracer
+from utils.metrics import llm_call
 
 class ImagePreprocessor:
-    def __init__(self):
-        self.llm_util = LLMUtil()
+    def __init__(self, llm_util=None):
+        self.llm_util = llm_util or create_llm_client()
+        self.encoder = ImageEncoder()
+        self.concurrency = 2  # 并发视觉调用数上限
+        self.timeout = None  # 单个视觉调用超时（秒）
 
     def encode_image_base64(self, image):
-        """将图片编码为base64，并添加正确的数据URI前缀"""
-        _, buffer = cv2.imencode('.jpg', image)
-        base64_string = base64.b64encode(buffer).decode('utf-8')
-        return base64_string
+        """将图片编码为base64（缩放/质量/格式及缓存见 ImageEncoder）"""
+        with tracer.span('encode.base64', 'encode') as span:
+            image_base64 = self.encoder.encode_base64(image)
+            span.set(bytes=len(image_base64))
+            return image_base64
     
 
     def direct_image_understanding(self, image):
@@ -29,16 +37,14 @@ class ImagePreprocessor:
         Provide a structured analysis that could be used for UI reconstruction.
         """
         
-        return self.llm_util.analyze_image_base64(prompt,image_base64)
+        return self._analyze('direct', prompt, image_base64)
 
 
     def edge_based_understanding(self, image, edges):
         """基于边缘检测结果进行理解"""
         # 创建可视化图像
-        visualization = image.copy()
-        for edge in edges:
-            cv2.circle(visualization, (edge['x'], edge['y']), 2, (0, 255, 0), -1)
-        
+        with tracer.span('edges.overlay', 'edge'):
+            visualization = draw_edge_overlay(image, edges)
         image_base64 = self.encode_image_base64(visualization)
         
         prompt = f"""
@@ -52,15 +58,44 @@ class ImagePreprocessor:
         Edge coordinates are provided for reference. Please provide a structured analysis.
         """
         
-        return self.llm_util.analyze_image_base64(prompt,image_base64)
+        return self._analyze('edge', prompt, image_base64)
 
+    def _analyze(self, kind, prompt, image_base64):
+        """调用视觉模型，追踪时记录请求与响应的字节数"""
+        with tracer.span('llm.vision', 'llm', kind=kind, bytes=len(prompt) + len(image_base64)) as span, \
+                llm_call('vision', kind):
+            result = self.llm_util.analyze_image_base64(prompt, image_base64)
+            span.set(response_bytes=len(result or ''))
+            return result
 
-    def combined_analysis(self, image, edges):
-        """结合两种方法的分析结果"""
-        direct_result = self.direct_image_understanding(image)
-        edge_result = self.edge_based_understanding(image, edges)
-        
-        return {
-            "direct_analysis": direct_result,
-            "edge_analysis": edge_result
-        }
\ No newline at end of file
+
+    def combined_analysis(self, image, edges, direct_analysis=None):
+        """结合两种方法的分析结果
+
+        direct_analysis 可传入返回直接分析结果的函数（如 RunContext.direct_analysis），
+        用于复用已有的直接分析。
+
+        单个分析失败或超时时，其结果为 None，错误信息记录在 "errors" 中，另一个分析照常返回；
+        两个分析都失败时抛出第一个错误
+        """
+        direct_analysis = direct_analysis or (lambda: self.direct_image_understanding(image))
+        # 两种分析互不依赖，并发调用
+        results = run_concurrently({
+            "direct_analysis": direct_analysis,
+            "edge_analysis": lambda: self.edge_based_understanding(image, edges)
+        }, max_workers=self.concurrency, timeout=self.timeout)
+
+        analysis = {}
+        errors = {}
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                print(f"{name} 失败: {str(result)}")
+                errors[name] = str(result)
+                analysis[name] = None
+            else:
+                analysis[name] = result
+        if len(errors) == len(results):
+            raise next(iter(results.values()))
+        if errors:
+            analysis["errors"] = errors
+        return analysis
\ No newline at end of file
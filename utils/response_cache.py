@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from utils.metrics import CACHE_REQUESTS
+
+
+class ResponseCache:
+    """按内容哈希寻址的磁盘缓存
+
+    每条记录一个JSON文件，按键的前两位分目录存放。
+    超过 ttl 秒的记录视为过期；总大小超过 max_bytes 时按最近访问时间(LRU)淘汰。
+    refresh=True 时不读取旧记录，但仍写入新结果。
+    name 用于区分不同用途的缓存（如 llm / metrics）的命中统计。
+    """
+
+    def __init__(self, cache_dir='.cache/llm', max_bytes=512 * 1024 * 1024, ttl=7 * 24 * 3600, refresh=False,
+                 name='llm'):
+        self.cache_dir = cache_dir
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl  # None 表示永不过期
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path, _ in self._entries())
+
+    @staticmethod
+    def make_key(*parts):
+        """由若干字符串/字节片段生成缓存键"""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part if isinstance(part, bytes) else str(part).encode('utf-8')
+            # 写入长度前缀，避免不同切分得到相同的键
+            digest.update(len(data).to_bytes(8, 'big'))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        yield path, os.path.getmtime(path)
+                    except OSError:
+                        continue
+
+    def get(self, key):
+        """读取缓存，未命中或已过期时返回 None"""
+        path = self._path(key)
+        value = None
+        if not self.refresh:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                if self.ttl is None or time.time() - entry["created"] <= self.ttl:
+                    value = entry["value"]
+                    # 以修改时间记录最近访问，供LRU淘汰使用
+                    os.utime(path)
+            except (OSError, ValueError, KeyError):
+                value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_REQUESTS.labels(cache=self.name, result='miss' if value is None else 'hit').inc()
+        return value
+
+    def set(self, key, value):
+        """写入缓存（先写临时文件再原子替换）"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False).encode('utf-8')
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(data) - old_size
+            if self.max_bytes is not None and self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """删除最久未访问的记录，直到总大小降到上限的90%以下"""
+        target = self.max_bytes * 0.9
+        for path, _ in sorted(self._entries(), key=lambda entry: entry[1]):
+            if self._size <= target:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                continue
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size_bytes": self._size
+        }
+
+
+class CachedLLMUtil:
+    """为 LLMUtil 的 native_chat / analyze_image_base64 / stream_chat 加上响应缓存
+
+    缓存键由模型名、提示词和图片内容共同决定，其它属性直接转发给被包装的对象。
+    """
+
+    def __init__(self, llm_util, cache):
+        self.llm_util = llm_util
+        self.cache = cache
+        self.model = (getattr(llm_util, 'model', None) or getattr(llm_util, 'model_name', None)
+                      or type(llm_util).__name__)
+
+    def native_chat(self, prompt):
+        key = self.cache.make_key('native_chat', self.model, prompt)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.llm_util.native_chat(prompt)
+            self.cache.set(key, response)
+        return response
+
+    def analyze_image_base64(self, prompt, image_base64):
+        key = self.cache.make_key('analyze_image_base64', self.model, prompt, image_base64)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.llm_util.analyze_image_base64(prompt, image_base64)
+            self.cache.set(key, response)
+        return response
+
+    def stream_chat(self, prompt):
+        """命中时整段返回；未命中时边转发边累积，完整结束后写入缓存"""
+        key = self.cache.make_key('native_chat', self.model, prompt)
+        response = self.cache.get(key)
+        if response is not None:
+            return iter([response])
+        chunks = self.llm_util.stream_chat(prompt)
+
+        def relay():
+            parts = []
+            try:
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+            finally:
+                # 调用方提前关闭（取消）时同时关闭底层流；不完整的输出不写入缓存
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+            self.cache.set(key, ''.join(parts))
+
+        return relay()
+
+    def __getattr__(self, name):
+        return getattr(self.llm_util, name)
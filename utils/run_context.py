@@ -0,0 +1,91 @@
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import cv2
+
+from utils.metrics import FRAMES_RETRIEVED, OUTPUT_BYTES
+from utils.tracing import tracer
+
+
+class RunContext:
+    """一次运行中 full 与 ablation 共享的视频帧和直接分析结果
+
+    第一帧只解码、只编码为JPEG一次，直接视觉分析也只调用一次，
+    两个分支都从这里取结果。多帧模式下第一帧由帧流提供（provide_frame），不再单独解码。
+    """
+
+    def __init__(self, video_path, preprocessor):
+        self.video_path = video_path
+        self.preprocessor = preprocessor
+        self._frame = None
+        self._frame_jpeg = None
+        self._direct_analysis = None  # 直接分析的 Future，进行中或已完成
+        self._frame_lock = threading.Lock()
+        self._analysis_lock = threading.Lock()
+
+    @property
+    def frame(self):
+        """视频第一帧（BGR）"""
+        with self._frame_lock:
+            if self._frame is None:
+                with tracer.span('video.open', 'video'):
+                    video = cv2.VideoCapture(self.video_path)
+                with tracer.span('video.decode', 'video'):
+                    ret, frame = video.read()
+                video.release()
+                if not ret:
+                    raise Exception("无法读取视频帧")
+                FRAMES_RETRIEVED.inc()
+                self._frame = frame
+            return self._frame
+
+    def provide_frame(self, frame):
+        """使用已经解码的第一帧（如帧流中的第0帧），尚未解码时不再重复读取视频"""
+        with self._frame_lock:
+            if self._frame is None:
+                self._frame = frame
+
+    def save_frame(self, path):
+        """保存第一帧为JPEG，多次保存只编码一次"""
+        frame = self.frame
+        with self._frame_lock:
+            if self._frame_jpeg is None:
+                with tracer.span('frame.encode_jpeg', 'encode') as span:
+                    ok, buffer = cv2.imencode('.jpg', frame)
+                    if not ok:
+                        raise Exception("无法编码视频帧")
+                    self._frame_jpeg = buffer.tobytes()
+                    span.set(bytes=len(self._frame_jpeg))
+        with open(path, 'wb') as f:
+            f.write(self._frame_jpeg)
+        OUTPUT_BYTES.labels(kind='image').inc(len(self._frame_jpeg))
+        return path
+
+    def direct_analysis(self):
+        """第一帧的直接视觉分析结果，只计算一次
+
+        第一个调用者在后台线程中发起视觉调用并登记 Future，之后的调用者等待同一个 Future；
+        每个调用者最多等待 preprocessor.timeout 秒。锁只保护 Future 的登记，不在调用期间持有，
+        因此某个调用者超时放弃后，其它调用者不会被卡住。调用失败时清除登记，下一次调用重新发起
+        """
+        frame = self.frame
+        with self._analysis_lock:
+            future = self._direct_analysis
+            if future is None:
+                future = self._direct_analysis = Future()
+                threading.Thread(target=self._run_direct_analysis, args=(future, frame),
+                                 name='direct-analysis', daemon=True).start()
+        timeout = self.preprocessor.timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"direct_analysis 超时 ({timeout}s)") from None
+
+    def _run_direct_analysis(self, future, frame):
+        try:
+            future.set_result(self.preprocessor.direct_image_understanding(frame))
+        except BaseException as e:
+            with self._analysis_lock:
+                if self._direct_analysis is future:
+                    self._direct_analysis = None
+            future.set_exception(e)
@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """进程的峰值常驻内存 (MB)，不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class _ProfiledLoader:
+    """单个 spec 专用的加载器代理：计时 create_module/exec_module，其它属性转发给原加载器
+
+    同一个加载器实例可能被多个 spec 共用（如命名空间包、自定义查找器），
+    因此不修改原加载器，而是替换 spec.loader
+    """
+
+    def __init__(self, loader, name, profiler):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        create_module = getattr(self._loader, 'create_module', None)
+        if create_module is None:
+            return None
+        # 扩展模块在 create_module 中完成初始化，同样计入耗时
+        self._profiler.records.pop(self._name, None)
+        return self._profiler._timed(self._name, create_module, spec)
+
+    def exec_module(self, module):
+        return self._profiler._timed(self._name, self._loader.exec_module, module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportProfiler:
+    """记录 install() 之后每个模块的导入耗时（类似 python -X importtime）
+
+    作为 sys.meta_path 中的第一个查找器，把找到的 spec 的加载器换成计时代理（原加载器不受影响）。
+    self 为模块自身代码的执行时间，cumulative 还包括它导入的子模块
+    """
+
+    def __init__(self):
+        self.records = {}
+        self._local = threading.local()
+        self._finding = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if getattr(self._finding, 'active', False):
+            return None
+        self._finding.active = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    self._wrap(spec)
+                    return spec
+            return None
+        finally:
+            self._finding.active = False
+
+    def _wrap(self, spec):
+        loader = spec.loader
+        # 内置/冻结模块的加载器是类本身，不做包装
+        if loader is None or isinstance(loader, type) or not hasattr(loader, 'exec_module'):
+            return
+        spec.loader = _ProfiledLoader(loader, spec.name, self)
+
+    def _timed(self, name, func, arg):
+        """执行加载步骤并把耗时累加到 name 的记录中"""
+        stack = self._stack()
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(arg)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            record = self.records.setdefault(name, {'self': 0.0, 'cumulative': 0.0})
+            record['self'] += elapsed - children
+            record['cumulative'] += elapsed
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def summary(self):
+        """按顶层包汇总自身耗时"""
+        packages = {}
+        for name, record in self.records.items():
+            package = packages.setdefault(name.split('.')[0], {'modules': 0, 'self': 0.0})
+            package['modules'] += 1
+            package['self'] += record['self']
+        return packages
+
+    def print_summary(self, top=20):
+        if not self.records:
+            return
+        total = sum(record['self'] for record in self.records.values())
+        rss = peak_rss_mb()
+        print(f"\n=== 启动导入耗时 ===")
+        print(f"导入 {len(self.records)} 个模块, 共 {total:.3f}s"
+              + (f", 峰值内存 {rss:.0f} MB" if rss is not None else ''))
+        print(f"{'package':<28}{'modules':>9}{'self (ms)':>11}")
+        packages = sorted(self.summary().items(), key=lambda item: item[1]['self'], reverse=True)
+        for package, info in packages[:top]:
+            print(f"{package:<28}{info['modules']:>9}{info['self'] * 1000:>11.1f}")
+        print(f"\n{'module':<44}{'self (ms)':>11}{'cumulative (ms)':>17}")
+        modules = sorted(self.records.items(), key=lambda item: item[1]['cumulative'], reverse=True)
+        for name, record in modules[:top]:
+            print(f"{name:<44}{record['self'] * 1000:>11.1f}{record['cumulative'] * 1000:>17.1f}")
+
+    def export_json(self, path):
+        """写出每个模块的 self/cumulative 耗时（毫秒）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'peak_rss_mb': peak_rss_mb(),
+                'modules': {name: {'self_ms': round(record['self'] * 1000, 3),
+                                   'cumulative_ms': round(record['cumulative'] * 1000, 3)}
+                            for name, record in self.records.items()}
+            }, f, indent=2)
+        return path
+
+
+# 全局分析器，由 main.py 的 --startup-profile 开启
+import_profiler = ImportProfiler()
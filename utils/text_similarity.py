@@ -0,0 +1,188 @@
+import difflib
+import re
+
+import numpy as np
+
+from utils.document import TOKEN_PATTERN
+
+WHITESPACE = re.compile(r'\s+')
+# 标签与标签之间的文本各算一个片段，压缩后的单行HTML也能按结构切分
+MARKUP_PATTERN = re.compile(r'<[^>]*>|[^<]+')
+HASH_BASE = np.uint64(1099511628211)
+HIGH_BITS_SHIFT = np.uint64(32)
+
+
+class TextSimilarityEngine:
+    """文本相似度计算
+
+    method:
+    - 'difflib': 原始实现，整页HTML字符级 SequenceMatcher，大页面接近 O(n^2)
+    - 'bounded': 带上限的 SequenceMatcher（autojunk）。不超过 max_chars 时与 difflib 相同，
+      超过时改为按标签/文本片段比较，片段数远少于字符数
+    - 'jaccard': HTML字符 k-shingle 集合的精确 Jaccard 相似度，O(n)
+    - 'minhash': 同样的 shingle 集合，用 num_perm 个哈希函数的 MinHash 签名估计 Jaccard，
+      签名在文档上缓存，适合一对多/多对多比较
+    - 'lcs': 可见文本词元序列的最长公共子序列，比例为 2*LCS/(n+m)，
+      使用位并行算法，O(n*m/w)
+    """
+
+    METHODS = ('difflib', 'bounded', 'jaccard', 'minhash', 'lcs')
+
+    def __init__(self, method='difflib', max_chars=20000, shingle_size=5, num_perm=128, seed=1):
+        if method not in self.METHODS:
+            raise ValueError(f"不支持的文本相似度方法: {method}")
+        self.method = method
+        self.max_chars = max_chars
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # 乘法-移位哈希族: (a*x + b) mod 2^64，a 取奇数
+        self._perm_a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._perm_b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def compute(self, doc1, doc2):
+        """计算两个 ParsedDocument 的文本相似度（0-1）"""
+        return getattr(self, f'_{self.method}')(doc1, doc2)
+
+    def matrix(self, docs):
+        """N 个文档两两之间的相似度矩阵（N×N）
+
+        jaccard 用稀疏矩阵乘积一次算出所有交集，minhash 对签名矩阵做向量化比较，
+        其余方法逐对计算上三角后镜像（对角线为1）
+        """
+        count = len(docs)
+        if self.method == 'jaccard':
+            key = ('shingles', self.shingle_size)
+            return jaccard_matrix([doc.feature(key, self.shingles) for doc in docs])
+        if self.method == 'minhash':
+            key = ('minhash', self.shingle_size, self.num_perm, self.seed)
+            signatures = np.stack([doc.feature(key, self.minhash_signature) for doc in docs])
+            result = np.empty((count, count))
+            for i in range(count):
+                result[i] = np.mean(signatures == signatures[i], axis=1)
+            return result
+        result = np.eye(count)
+        for i in range(count):
+            for j in range(i + 1, count):
+                result[i, j] = result[j, i] = self.compute(docs[i], docs[j])
+        return result
+
+    # --- SequenceMatcher ---
+
+    @staticmethod
+    def _difflib(doc1, doc2):
+        return difflib.SequenceMatcher(None, doc1.html, doc2.html).ratio()
+
+    def _bounded(self, doc1, doc2):
+        if max(len(doc1.html), len(doc2.html)) <= self.max_chars:
+            return self._difflib(doc1, doc2)
+        seq1 = doc1.feature('markup', self.markup_segments)
+        seq2 = doc2.feature('markup', self.markup_segments)
+        return difflib.SequenceMatcher(None, seq1, seq2, autojunk=True).ratio()
+
+    @staticmethod
+    def markup_segments(doc):
+        """把HTML切成标签和文本片段（去掉空白差异）"""
+        segments = (WHITESPACE.sub(' ', part).strip() for part in MARKUP_PATTERN.findall(doc.html))
+        return [segment for segment in segments if segment]
+
+    # --- shingle / MinHash ---
+
+    def shingles(self, doc):
+        """HTML（空白已压缩）的 k 字节 shingle 哈希集合，排好序的 uint64 数组"""
+        data = np.frombuffer(WHITESPACE.sub(' ', doc.html).encode('utf-8'), dtype=np.uint8)
+        k = self.shingle_size
+        if len(data) < k:
+            return np.unique(data.astype(np.uint64))
+        count = len(data) - k + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for offset in range(k):
+                hashes = hashes * HASH_BASE + data[offset:offset + count].astype(np.uint64)
+        return np.unique(hashes)
+
+    def minhash_signature(self, doc):
+        """shingle 集合的 MinHash 签名（num_perm 个最小哈希值）"""
+        shingles = doc.feature(('shingles', self.shingle_size), self.shingles)
+        signature = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        if len(shingles) == 0:
+            return signature
+        block = max(1, 2 ** 20 // len(shingles))
+        with np.errstate(over='ignore'):
+            for start in range(0, self.num_perm, block):
+                a = self._perm_a[start:start + block, None]
+                b = self._perm_b[start:start + block, None]
+                # 取高32位，避免乘法-移位哈希低位随机性差
+                values = (a * shingles[None, :] + b) >> HIGH_BITS_SHIFT
+                signature[start:start + block] = values.min(axis=1)
+        return signature
+
+    def _jaccard(self, doc1, doc2):
+        key = ('shingles', self.shingle_size)
+        set1, set2 = doc1.feature(key, self.shingles), doc2.feature(key, self.shingles)
+        if len(set1) == 0 and len(set2) == 0:
+            return 1.0
+        intersection = len(np.intersect1d(set1, set2, assume_unique=True))
+        return intersection / (len(set1) + len(set2) - intersection)
+
+    def _minhash(self, doc1, doc2):
+        key = ('minhash', self.shingle_size, self.num_perm, self.seed)
+        sig1 = doc1.feature(key, self.minhash_signature)
+        sig2 = doc2.feature(key, self.minhash_signature)
+        return float(np.mean(sig1 == sig2))
+
+    # --- 可见文本 LCS ---
+
+    @staticmethod
+    def text_tokens(doc):
+        return TOKEN_PATTERN.findall(doc.text.lower())
+
+    def _lcs(self, doc1, doc2):
+        tokens1 = doc1.feature('text_tokens', self.text_tokens)
+        tokens2 = doc2.feature('text_tokens', self.text_tokens)
+        total = len(tokens1) + len(tokens2)
+        if total == 0:
+            return 1.0
+        return 2.0 * lcs_length(tokens1, tokens2) / total
+
+
+def lcs_length(seq1, seq2):
+    """最长公共子序列长度（Allison-Dix/Hyyrö 位并行算法，用Python大整数做位向量）"""
+    if len(seq1) < len(seq2):
+        seq1, seq2 = seq2, seq1
+    if not seq2:
+        return 0
+    masks = {}
+    for i, item in enumerate(seq1):
+        masks[item] = masks.get(item, 0) | (1 << i)
+    full = (1 << len(seq1)) - 1
+    v = full
+    for item in seq2:
+        u = v & masks.get(item, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(seq1) - bin(v).count('1')
+
+
+def jaccard_matrix(item_sets, empty=1.0):
+    """多个集合两两之间的 Jaccard 相似度矩阵
+
+    把集合编码成 文档×元素 的稀疏0/1矩阵，交集大小 = B·Bᵀ，并集 = |A| + |B| - 交集。
+    两个集合都为空时取 empty
+    """
+    from scipy import sparse  # 只有矩阵计算需要，避免拖慢两两评估的启动
+
+    item_sets = [np.unique(np.asarray(items)) for items in item_sets]
+    count = len(item_sets)
+    sizes = np.array([len(items) for items in item_sets], dtype=np.float64)
+    if sizes.sum() == 0:
+        return np.full((count, count), empty)
+    _, columns = np.unique(np.concatenate(item_sets), return_inverse=True)
+    rows = np.repeat(np.arange(count), sizes.astype(np.int64))
+    matrix = sparse.csr_matrix((np.ones(len(columns)), (rows, columns.ravel())),
+                               shape=(count, columns.max() + 1))
+    intersection = (matrix @ matrix.T).toarray()
+    union = sizes[:, None] + sizes[None, :] - intersection
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(union > 0, intersection / union, empty)
+    return result
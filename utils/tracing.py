@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+
+
+class Span:
+    """一个计时区间：记录墙钟时间、所在线程的CPU时间、线程以及附加参数（如 bytes）
+
+    可作为上下文管理器使用，也可以手动调用 end()
+    """
+
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start', 'cpu_start', 'thread')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.thread = threading.current_thread()
+        self.cpu_start = time.thread_time()
+        self.start = time.perf_counter()
+
+    def set(self, **args):
+        """补充参数，例如 span.set(bytes=len(payload))"""
+        self.args.update(args)
+        return self
+
+    def end(self, **args):
+        self.args.update(args)
+        self.tracer._finish(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = f"{exc_type.__name__}: {exc}"
+        self.end()
+        return False
+
+
+class _NullSpan:
+    """未启用追踪时返回的空区间，所有操作都不做任何事"""
+
+    __slots__ = ()
+
+    def set(self, **args):
+        return self
+
+    def end(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """进程内的区间追踪
+
+    默认关闭，span() 返回空区间，开销可以忽略；enable() 之后记录所有区间，
+    可导出为 Chrome/Perfetto 的 trace 文件（chrome://tracing 或 ui.perfetto.dev 打开），
+    也可以按区间名称汇总。子进程（边缘检测、并行评估）中的区间不会被记录
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        with self._lock:
+            self.enabled = True
+            self.events = []
+            self._origin = time.perf_counter()
+
+    def span(self, name, cat='app', **args):
+        """开始一个区间；未启用时返回 NULL_SPAN"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, cat, args)
+
+    def _finish(self, span):
+        end = time.perf_counter()
+        cpu = time.thread_time() - span.cpu_start if threading.current_thread() is span.thread else None
+        event = {
+            'name': span.name,
+            'cat': span.cat,
+            'start': span.start - self._origin,
+            'wall': end - span.start,
+            'cpu': cpu,
+            'tid': span.thread.ident,
+            'thread': span.thread.name,
+            'args': span.args
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def export_chrome(self, path):
+        """导出 Chrome trace event 格式（ph=X 完整事件，时间单位为微秒）"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace_events = []
+        for thread_id, thread_name in sorted({(event['tid'], event['thread']) for event in events}):
+            trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                                 'args': {'name': thread_name}})
+        for event in events:
+            args = dict(event['args'])
+            if event['cpu'] is not None:
+                args['cpu_ms'] = round(event['cpu'] * 1000, 3)
+            trace_events.append({
+                'name': event['name'],
+                'cat': event['cat'],
+                'ph': 'X',
+                'ts': round(event['start'] * 1e6, 1),
+                'dur': round(event['wall'] * 1e6, 1),
+                'pid': pid,
+                'tid': event['tid'],
+                'args': args
+            })
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+        return path
+
+    def summary(self):
+        """按区间名称汇总：次数、墙钟总/平均/最大耗时、CPU总耗时、字节数、线程数"""
+        with self._lock:
+            events = list(self.events)
+        rows = {}
+        for event in events:
+            row = rows.setdefault(event['name'], {
+                'cat': event['cat'], 'count': 0, 'wall': 0.0, 'max': 0.0, 'cpu': 0.0,
+                'bytes': 0, 'threads': set()
+            })
+            row['count'] += 1
+            row['wall'] += event['wall']
+            row['max'] = max(row['max'], event['wall'])
+            row['cpu'] += event['cpu'] or 0.0
+            row['bytes'] += event['args'].get('bytes', 0) or 0
+            row['threads'].add(event['tid'])
+        return rows
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print(f"\n=== 追踪汇总 ===")
+        print(f"{'span':<28}{'count':>7}{'wall (s)':>10}{'mean (ms)':>11}{'max (ms)':>10}"
+              f"{'cpu (s)':>9}{'bytes':>12}{'threads':>9}")
+        for name, row in sorted(rows.items(), key=lambda item: item[1]['wall'], reverse=True):
+            print(f"{name:<28}{row['count']:>7}{row['wall']:>10.3f}{row['wall'] / row['count'] * 1000:>11.1f}"
+                  f"{row['max'] * 1000:>10.1f}{row['cpu']:>9.3f}{row['bytes']:>12}{len(row['threads']):>9}")
+
+
+# 全局追踪器，由 main.py 的 --trace 开启
+tracer = Tracer()
@@ -0,0 +1,140 @@
+from collections import Counter
+
+from zss import simple_distance
+
+try:
+    from apted import APTED, Config
+except ImportError:  # apted 为可选依赖，缺失时精确模式退回 zss
+    APTED = None
+    Config = object
+
+# auto 模式下使用精确算法的默认最大节点数。没有 apted 时 zss 为 O(n^4)，
+# 100 个节点已需约2秒，因此使用低得多的上限
+APTED_CUTOFF = 500
+ZSS_CUTOFF = 100
+
+_fallback_warned = False
+
+
+def _warn_zss_fallback():
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        print("注意: 未安装 apted，精确树编辑距离使用较慢的 zss (Zhang-Shasha)，"
+              f"auto 模式默认只对 {ZSS_CUTOFF} 个节点以内的页面精确计算 (pip install .[fast] 安装 apted)")
+
+
+class _ZssNodeConfig(Config):
+    """让 APTED 使用 zss.Node，代价与 zss.simple_distance 相同（增/删/改名各为1）"""
+
+    def children(self, node):
+        return node.children
+
+    def rename(self, node1, node2):
+        return 0 if node1.label == node2.label else 1
+
+
+class TreeDistanceEngine:
+    """树编辑距离计算
+
+    mode:
+    - 'exact': 精确树编辑距离。安装了 apted 时使用 APTED（最坏 O(n^3)），
+      否则使用 zss 的 Zhang-Shasha 算法（最坏 O(n^4)）
+    - 'approximate': pq-gram 距离，O(n log n)，适合上千节点的页面
+    - 'auto': 较大一棵树的节点数不超过 cutoff 时用精确算法，否则用近似算法。
+      cutoff 为 None 时按精确算法选择默认值（apted 为 500，zss 为 100）
+    """
+
+    MODES = ('auto', 'exact', 'approximate')
+
+    def __init__(self, mode='auto', cutoff=None, p=2, q=3):
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的树距离模式: {mode}")
+        self.mode = mode
+        if cutoff is None:
+            cutoff = APTED_CUTOFF if APTED is not None else ZSS_CUTOFF
+        self.cutoff = cutoff
+        self.p = p
+        self.q = q
+
+    @property
+    def exact_algorithm(self):
+        return 'apted' if APTED is not None else 'zhang-shasha'
+
+    def exact_distance(self, tree1, tree2):
+        """精确树编辑距离"""
+        if APTED is not None:
+            return APTED(tree1, tree2, _ZssNodeConfig()).compute_edit_distance()
+        _warn_zss_fallback()
+        return simple_distance(tree1, tree2)
+
+    def pq_gram_profile(self, tree):
+        """计算树的 pq-gram 多重集合（非递归遍历，避免深层页面超出递归限制）"""
+        p, q = self.p, self.q
+        profile = Counter()
+        stack = [(tree, ('*',) * p)]
+        while stack:
+            node, ancestors = stack.pop()
+            ancestors = ancestors[1:] + (node.label,)
+            siblings = ('*',) * q
+            if not node.children:
+                profile[ancestors + siblings] += 1
+                continue
+            for child in node.children:
+                siblings = siblings[1:] + (child.label,)
+                profile[ancestors + siblings] += 1
+                stack.append((child, ancestors))
+            for _ in range(q - 1):
+                siblings = siblings[1:] + ('*',)
+                profile[ancestors + siblings] += 1
+        return profile
+
+    def pq_gram_distance(self, tree1, tree2, profile1=None, profile2=None):
+        """pq-gram 距离，取值 0（相同）到 1（完全不同）。可传入已计算的 profile"""
+        if profile1 is None:
+            profile1 = self.pq_gram_profile(tree1)
+        if profile2 is None:
+            profile2 = self.pq_gram_profile(tree2)
+        total = sum(profile1.values()) + sum(profile2.values())
+        if total == 0:
+            return 0.0
+        intersection = sum((profile1 & profile2).values())
+        return 1 - 2 * intersection / total
+
+    def compute_documents(self, doc1, doc2):
+        """对两个 ParsedDocument 计算，pq-gram profile 缓存在文档上，一对多比较时只算一次"""
+        key = ('pq-gram', self.p, self.q)
+        profiles = None
+        if self.mode != 'exact':
+            builder = lambda doc: self.pq_gram_profile(doc.tree)
+            profiles = (lambda: doc1.feature(key, builder), lambda: doc2.feature(key, builder))
+        return self.compute(doc1.tree, doc2.tree, doc1.node_count, doc2.node_count, profiles)
+
+    def compute(self, tree1, tree2, nodes1, nodes2, profiles=None):
+        """计算归一化的树结构相似度
+
+        返回 score、distance、method（exact/approximate）和 algorithm。
+        精确模式 score = 1 - 编辑距离 / (2 * 较大节点数)；近似模式把 pq-gram 距离
+        按较大节点数换算为估计的编辑距离后，用同样方式归一化。
+        profiles 为可选的 (获取profile1, 获取profile2) 函数对，仅在近似模式下调用
+        """
+        max_nodes = max(nodes1, nodes2)
+        mode = self.mode
+        if mode == 'auto':
+            mode = 'exact' if max_nodes <= self.cutoff else 'approximate'
+
+        if mode == 'exact':
+            distance = self.exact_distance(tree1, tree2)
+            algorithm = self.exact_algorithm
+        else:
+            profile1, profile2 = (profiles[0](), profiles[1]()) if profiles else (None, None)
+            distance = self.pq_gram_distance(tree1, tree2, profile1, profile2) * max_nodes
+            algorithm = f"pq-gram(p={self.p},q={self.q})"
+
+        score = 1 - (distance / (max_nodes * 2)) if max_nodes else 1.0
+        return {
+            "score": float(score),
+            "distance": float(distance),
+            "method": mode,
+            "algorithm": algorithm
+        }
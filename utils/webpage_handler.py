@@ -6,51 +6,280 @@
 
 import cv2
 import json
+import os
+import queue
+import shutil
+import threading
+import time
 import numpy as np
 from datetime import datetime
 from pathlib import Path
-from llm_util import LLMUtil
 from utils.preprocess import ImagePreprocessor
 from utils.evaluate import HTMLEvaluator
+from utils.edges import detect_edges, detect_edge_points, detect_edges_parallel
+from utils.dedup import FrameDeduplicator
+from utils.edge_store import edges_to_array, save_edges
+from utils.tracing import tracer
+from utils.metrics import (EDGE_POINTS, FRAMES_DEDUPLICATED, FRAMES_KEPT, FRAMES_RETRIEVED,
+                           OUTPUT_BYTES, llm_call)
+from utils.layout import LayoutExtractor
+from utils.concurrency import run_concurrently
+from utils.run_context import RunContext
+from utils.llm_client import create_llm_client
+from utils.html_stream import strip_code_fences, stream_to_file
+
+# 某一分析失败（见 ImagePreprocessor.combined_analysis）时提示词中的占位文本
+UNAVAILABLE_ANALYSIS = "(unavailable: this analysis failed)"
 
 class WebpageHandler:
-    def __init__(self):
-        self.llm_util = LLMUtil()
+    SAMPLING_MODES = ('grab', 'seek', 'read')
+
+    def __init__(self, llm_util=None):
+        # LLM客户端与 ImagePreprocessor 共享，默认使用 LLMUtil 后端
+        self.llm_util = llm_util or create_llm_client()
         self.sample_rate = 1  # 1秒采样一次
-        self.preprocessor = ImagePreprocessor()
+        self.sampling = 'grab'  # 帧采样方式，见 extract_frames
+        self.extract_stats = {}
+        self.prefetch = 4  # 流式读取时的预取帧数上限
+        self.multi_frame = False  # 是否分析所有采样帧
+        self.workers = None  # 边缘检测进程数，None 表示CPU核数
+        self.dedup_threshold = 5  # 近重复帧的dHash汉明距离阈值，None 表示不去重
+        self.dedup_stats = {}
+        self.preprocessor = ImagePreprocessor(self.llm_util)
+        self.layout_extractor = LayoutExtractor()
+        self.llm_concurrency = 3  # 并发LLM调用数上限
+        self.llm_timeout = None  # 单个LLM调用超时（秒），None 表示不限制
+        self.stream = False  # 是否流式接收LLM输出并实时写入HTML文件
+        self.stream_stats = {}  # 各策略的首token延迟与生成速度
+        self.evaluator = HTMLEvaluator()
+        self.eval_jobs = None  # evaluate 模式下并行评估的进程数
+
+    def reset_stats(self):
+        """清空上一次运行的统计（常驻 worker 中复用处理器时调用）"""
+        self.extract_stats = {}
+        self.dedup_stats = {}
+        self.stream_stats = {}
+        self.preprocessor.encoder.stats.clear()
+
+    def extract_frames(self, video_path, sampling=None):
+        """从视频中提取帧
+
+        sampling 可选:
+        - 'grab': 每帧都 grab()（仍会解码），仅对采样帧 retrieve() 转换为BGR图像 (默认)
+        - 'seek': 通过 CAP_PROP_POS_FRAMES 直接定位到采样帧
+        - 'read': 逐帧 read()，每帧都转换为BGR图像（旧行为）
+        读取/转换/保留的帧数记录在 self.extract_stats 中。grab/read 模式下
+        frames_grabbed 为实际顺序解码的帧数；seek 模式下 OpenCV 每次定位都要从最近的
+        关键帧解码到目标帧，这部分解码无法统计，因此改为记录 sampled_reads
+        （定位后读取的次数），不能与 frames_grabbed 直接比较
+
+        会把所有采样帧保存在内存中，长视频请使用 iter_frames
+        """
+        return [frame for _, _, frame in self.iter_frames(video_path, sampling, prefetch=0)]
+
+    def iter_frames(self, video_path, sampling=None, prefetch=None):
+        """流式读取采样帧，逐个产出 (frame_id, timestamp, frame)
+
+        解码在后台线程中进行，最多预取 prefetch 帧，
+        因此内存占用与视频长度无关。prefetch=0 时在当前线程同步解码。
+        """
+        sampling = sampling or self.sampling
+        if sampling not in self.SAMPLING_MODES:
+            raise ValueError(f"不支持的采样模式: {sampling}")
+        prefetch = self.prefetch if prefetch is None else prefetch
+
+        if prefetch <= 0:
+            yield from self._decode_frames(video_path, sampling)
+            return
+
+        frame_queue = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # 消费者提前退出时不能一直阻塞在满队列上
+            while not stop.is_set():
+                try:
+                    frame_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
 
-    def extract_frames(self, video_path):
-        """从视频中提取帧"""
-        frames = []
-        video = cv2.VideoCapture(video_path)
+        def producer():
+            # 无论以何种方式退出（包括 BaseException），都要给消费者发送结束信号
+            end = done
+            try:
+                for item in self._decode_frames(video_path, sampling):
+                    if not put(item):
+                        return
+            except BaseException as e:
+                end = e
+            finally:
+                put(end)
+
+        thread = threading.Thread(target=producer, name='frame-decoder', daemon=True)
+        thread.start()
+        try:
+            while True:
+                try:
+                    item = frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    # 解码线程已退出却没有留下结束信号时不能一直等待
+                    if not thread.is_alive() and frame_queue.empty():
+                        raise RuntimeError("解码线程意外退出")
+                    continue
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def _decode_frames(self, video_path, sampling):
+        """按采样方式解码视频，统计信息实时写入 self.extract_stats
+
+        seek 模式只记录 sampled_reads，定位时从关键帧开始的解码不计入
+        """
+        with tracer.span('video.open', 'video'):
+            video = cv2.VideoCapture(video_path)
+        if not video.isOpened():
+            raise Exception(f"无法打开视频: {video_path}")
         fps = video.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(fps * self.sample_rate)
-        
-        current_frame = 0
-        while video.isOpened():
-            ret, frame = video.read()
-            if not ret:
-                break
-                
-            if current_frame % frame_interval == 0:
-                frames.append(frame)
-            current_frame += 1
-            
-        video.release()
-        return frames
+        frame_interval = max(1, int(fps * self.sample_rate))
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        # 部分容器拿不到总帧数，无法定位时退回 grab 模式
+        if sampling == 'seek' and total_frames <= 0:
+            sampling = 'grab'
+
+        stats = {
+            "sampling": sampling,
+            "frame_interval": frame_interval,
+            "sampled_reads" if sampling == 'seek' else "frames_grabbed": 0,
+            "frames_retrieved": 0,
+            "frames_kept": 0
+        }
+        self.extract_stats = stats
+
+        # 每个 video.decode 区间覆盖从上一个采样帧之后到本采样帧的全部 grab/read
+        span = None
+
+        def sample(frame_index, frame):
+            nonlocal span
+            span.end(frame_index=frame_index, bytes=frame.nbytes)
+            span = None
+            stats["frames_kept"] += 1
+            timestamp = frame_index / fps if fps > 0 else 0
+            return stats["frames_kept"] - 1, timestamp, frame
+
+        try:
+            if sampling == 'seek':
+                for frame_index in range(0, total_frames, frame_interval):
+                    span = tracer.span('video.decode', 'video', sampling=sampling)
+                    video.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                    ret, frame = video.read()
+                    if not ret:
+                        break
+                    stats["sampled_reads"] += 1
+                    stats["frames_retrieved"] += 1
+                    yield sample(frame_index, frame)
+            else:
+                current_frame = 0
+                while True:
+                    span = span or tracer.span('video.decode', 'video', sampling=sampling)
+                    if sampling == 'read':
+                        ret, frame = video.read()
+                        if not ret:
+                            break
+                        stats["frames_grabbed"] += 1
+                        stats["frames_retrieved"] += 1
+                        if current_frame % frame_interval == 0:
+                            yield sample(current_frame, frame)
+                    else:
+                        # grab()照常解码但不做颜色转换，未采样的帧不会转换为BGR
+                        if not video.grab():
+                            break
+                        stats["frames_grabbed"] += 1
+                        if current_frame % frame_interval == 0:
+                            ret, frame = video.retrieve()
+                            if not ret:
+                                break
+                            stats["frames_retrieved"] += 1
+                            yield sample(current_frame, frame)
+                    current_frame += 1
+        finally:
+            if span is not None:
+                span.end()
+            video.release()
+            FRAMES_RETRIEVED.inc(stats["frames_retrieved"])
+            FRAMES_KEPT.inc(stats["frames_kept"])
+
+    def iter_frame_analysis(self, video_path, sampling=None, frames_dir=None, context=None):
+        """逐帧流式处理：边缘检测（进程池）+ 图像分析，每次只持有少量帧
+
+        指定 frames_dir 时同时把每个采样帧保存为图片；
+        传入 RunContext 时把第一帧交给它（不再单独解码），并复用其直接分析结果。
+        dedup_threshold 不为 None 时，近重复帧直接复用代表帧的分析结果，
+        去重统计保存在 self.dedup_stats 中
+        """
+        deduplicator = None
+        representative_analysis = {}
+        if self.dedup_threshold is not None:
+            deduplicator = FrameDeduplicator(self.dedup_threshold)
+            self.dedup_stats = deduplicator.stats()
+
+        frames = self.iter_frames(video_path, sampling)
+        for frame_id, timestamp, frame, edges in detect_edges_parallel(frames, self.workers):
+            # 边缘检测在子进程中完成，这里只记录点数
+            span = tracer.span('frame.analyze', 'frame', frame_id=frame_id, edge_points=len(edges))
+            EDGE_POINTS.observe(len(edges))
+            frame_data = {
+                "frame_id": frame_id,
+                "timestamp": timestamp
+            }
+            if frames_dir is not None:
+                image_path = Path(frames_dir) / f"frame_{frame_id:04d}.jpg"
+                with tracer.span('frame.save', 'io'):
+                    cv2.imwrite(str(image_path), frame)
+                OUTPUT_BYTES.labels(kind='image').inc(os.path.getsize(image_path))
+                frame_data["image"] = str(image_path)
+            frame_data["edges"] = edges
+            frame_data["layout"] = self._extract_layout(frame)
+
+            with tracer.span('frame.dedup', 'frame'):
+                duplicate_of = deduplicator.find_duplicate(frame_id, frame) if deduplicator else None
+            if context is not None and frame_id == 0:
+                # 第一帧交给 context，ablation 等不再重新解码
+                context.provide_frame(frame)
+            if duplicate_of is None:
+                direct_analysis = context.direct_analysis if context and frame_id == 0 else None
+                analysis = self._combined_analysis(frame, edges, direct_analysis)
+                if deduplicator:
+                    representative_analysis[frame_id] = analysis
+            else:
+                analysis = representative_analysis[duplicate_of]
+                frame_data["duplicate_of"] = duplicate_of
+                FRAMES_DEDUPLICATED.inc()
+            frame_data["analysis"] = analysis
+            if deduplicator:
+                self.dedup_stats = deduplicator.stats()
+            span.end(duplicate_of=duplicate_of)
+            yield frame_data
 
     def detect_edges(self, frame):
         """对图片进行边缘检测"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 100, 200)
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        coordinates = []
-        for contour in contours:
-            for point in contour:
-                x, y = point[0]
-                coordinates.append({"x": int(x), "y": int(y)})
-        return coordinates
+        return detect_edges(frame)
+
+    def _extract_layout(self, frame):
+        with tracer.span('layout.extract', 'frame'):
+            return self.layout_extractor.extract(frame)
+
+    def _combined_analysis(self, frame, edges, direct_analysis=None):
+        with tracer.span('analysis.combined', 'llm'):
+            return self.preprocessor.combined_analysis(frame, edges, direct_analysis)
 
     def generate_json(self, frames_data):
         """生成JSON数据"""
@@ -67,13 +296,21 @@ class WebpageHandler:
         }
         return json.dumps(output, indent=2)
 
-    def generate_html(self, json_data):
-        """使用不同的CoT策略生成多个HTML版本"""
+    def generate_html(self, json_data, output_dir="output"):
+        """使用不同的CoT策略生成多个HTML版本，写入 output_dir/html_versions"""
         
         # 解析JSON数据并创建简化版本
         data = json.loads(json_data)
         frame_data = data["frames"][0]
         
+        # 组件布局树（几十个包围盒）代替原始边缘点放入提示词
+        layout_section = ""
+        if frame_data.get("layout"):
+            layout_section = f"""
+        LAYOUT = `{LayoutExtractor.to_json(frame_data["layout"])}`
+        (UI component bounding boxes [x, y, w, h] in pixels, grouped into rows and columns)
+        """
+        
         # 基础提示词模板
         base_template = f"""
         Generate a complete, runnable HTML page that visualizes UI analysis results. 
@@ -81,8 +318,9 @@ class WebpageHandler:
         
         Use the following analysis data:
         
-        DIRECT_ANALYSIS = `{frame_data["analysis"]["direct_analysis"]}`
-        EDGE_ANALYSIS = `{frame_data["analysis"]["edge_analysis"]}`
+        DIRECT_ANALYSIS = `{frame_data["analysis"]["direct_analysis"] or UNAVAILABLE_ANALYSIS}`
+        EDGE_ANALYSIS = `{frame_data["analysis"]["edge_analysis"] or UNAVAILABLE_ANALYSIS}`
+        {layout_section}
 
         Technical Requirements:
         1. Use Tailwind CSS (include CDN)
@@ -168,21 +406,72 @@ class WebpageHandler:
         """
         
         try:
-            # 生成不同版本的HTML
-            results = {
-                'standard_cot': self.llm_util.native_chat(standard_cot_prompt),
-                'tree_of_thought': self.llm_util.native_chat(tree_of_thought_prompt),
-                'graph_of_thought': self.llm_util.native_chat(graph_of_thought_prompt)
+            output_dir = Path(output_dir) / 'html_versions'
+            output_dir.mkdir(parents=True, exist_ok=True)
+            prompts = {
+                'standard_cot': standard_cot_prompt,
+                'tree_of_thought': tree_of_thought_prompt,
+                'graph_of_thought': graph_of_thought_prompt
             }
             
-            # 保存不同版本
-            output_dir = Path('output/html_versions')
-            output_dir.mkdir(parents=True, exist_ok=True)
+            # 三种策略互不依赖，并发生成不同版本的HTML；单个策略失败不影响其它策略
+            # 流式模式下边接收边写入文件，超时的策略停止接收并删除写了一半的文件
+            cancel = {approach: threading.Event() for approach in prompts}
+            if self.stream:
+                tasks = {
+                    approach: lambda approach=approach, prompt=prompt: self._stream_html(
+                        approach, prompt, output_dir / f'visualization_{approach}.html', cancel[approach])
+                    for approach, prompt in prompts.items()
+                }
+            else:
+                tasks = {
+                    approach: lambda approach=approach, prompt=prompt: self._native_chat(approach, prompt)
+                    for approach, prompt in prompts.items()
+                }
+            results = run_concurrently(tasks, max_workers=self.llm_concurrency, timeout=self.llm_timeout,
+                                       on_timeout=lambda approach: cancel[approach].set())
             
+            # 保存不同版本
+            html_paths = {}
+            errors = {}
             for approach, html in results.items():
-                # 确保结果是纯HTML代码
-                if not html.strip().startswith('<!DOCTYPE html>'):
-                    html = f"""<!DOCTYPE html>
+                if isinstance(html, Exception):
+                    print(f"{approach} 生成失败: {str(html)}")
+                    errors[approach] = str(html)
+                    if self.stream:
+                        # 超时的流可能仍阻塞在等待下一个片段上，不等它自行清理
+                        try:
+                            os.remove(output_dir / f'visualization_{approach}.html')
+                        except OSError:
+                            pass
+                    continue
+                
+                file_path = output_dir / f'visualization_{approach}.html'
+                document = self._ensure_html_document(html, approach)
+                # 流式模式下文件已写好，只有需要补全文档结构时才重写
+                if not self.stream or document != html:
+                    with tracer.span('html.write', 'io', strategy=approach, bytes=len(document)):
+                        with open(file_path, 'w', encoding='utf-8') as f:
+                            f.write(document)
+                    OUTPUT_BYTES.labels(kind='html').inc(len(document.encode('utf-8')))
+                html_paths[approach] = str(file_path)
+            
+            if errors:
+                html_paths['errors'] = errors
+            return html_paths
+            
+        except Exception as e:
+            print(f"HTML生成过程中出现错误: {str(e)}")
+            return {
+                'error': str(e)
+            }
+    
+
+    def _ensure_html_document(self, html, approach):
+        """确保结果是完整的HTML文档，否则补全外层结构"""
+        if html.strip().startswith('<!DOCTYPE html>'):
+            return html
+        return f"""<!DOCTYPE html>
                     <html lang="en">
                     <head>
                         <meta charset="UTF-8">
@@ -194,97 +483,146 @@ class WebpageHandler:
                         {html}
                     </body>
                     </html>"""
-                
-                file_path = output_dir / f'visualization_{approach}.html'
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(html)
-            
-            return {
-                'standard_cot': str(output_dir / 'visualization_standard_cot.html'),
-                'tree_of_thought': str(output_dir / 'visualization_tree_of_thought.html'),
-                'graph_of_thought': str(output_dir / 'visualization_graph_of_thought.html')
-            }
-            
-        except Exception as e:
-            print(f"HTML生成过程中出现错误: {str(e)}")
-            return {
-                'error': str(e)
-            }
-    
 
-    def run(self, video_path, output_dir="output"):
-        """主处理流程 - 只处理第一帧，结合边缘检测和图片理解"""
+    def _native_chat(self, approach, prompt):
+        """调用LLM生成某一策略的HTML，追踪时记录请求与响应的字节数
+
+        与流式模式一样去除外层的 markdown 代码块标记
+        """
+        with tracer.span('llm.native_chat', 'llm', strategy=approach, bytes=len(prompt)) as span, \
+                llm_call('native_chat', approach):
+            html = self.llm_util.native_chat(prompt)
+            span.set(response_bytes=len(html or ''))
+            return strip_code_fences(html) if html else html
+
+    def _stream_html(self, approach, prompt, file_path, cancel=None):
+        """流式生成HTML并实时写入文件，记录首token延迟和生成速度
+
+        cancel 被设置（调用超时）后停止接收并删除写了一半的文件
+        """
+        with tracer.span('llm.stream_chat', 'llm', strategy=approach, bytes=len(prompt)) as span, \
+                llm_call('stream_chat', approach):
+            start = time.perf_counter()
+            html, stats = stream_to_file(self.llm_util.stream_chat(prompt), file_path, start, cancel)
+            self.stream_stats[approach] = stats
+            OUTPUT_BYTES.labels(kind='html').inc(os.path.getsize(file_path))
+            span.set(response_bytes=len(html), ttft_ms=stats.get('ttft_ms'))
+            return html
+
+    def run(self, video_path, output_dir="output", multi_frame=None, context=None):
+        """主处理流程 - 结合边缘检测和图片理解
+
+        默认只处理第一帧；multi_frame 为 True 时处理所有采样帧，
+        边缘检测在进程池中并行进行，结果写入 edges.json 的 frames 数组。
+        传入与 run_ablation 共享的 context 时复用已解码的帧和直接分析结果
+        """
+        multi_frame = self.multi_frame if multi_frame is None else multi_frame
+        context = context or RunContext(video_path, self.preprocessor)
         # 创建输出目录
         Path(output_dir).mkdir(parents=True, exist_ok=True)
-        
-        # 读取视频第一帧
-        video = cv2.VideoCapture(video_path)
-        ret, frame = video.read()
-        video.release()
-        
-        if not ret:
-            raise Exception("无法读取视频帧")
-        
-        # 处理这一帧的边缘检测
-        edges = self.detect_edges(frame)
-        
-        # 保存原始帧图像
         frame_path = f"{output_dir}/frame.jpg"
-        cv2.imwrite(frame_path, frame)
-        
-        # 进行完整分析（包括直接分析和基于边缘的分析）
-        analysis_results = self.preprocessor.combined_analysis(frame, edges)
         
-        # 生成完整的JSON数据
-        json_data = {
-            "timestamp": datetime.now().isoformat(),
-            "frames": [
+        if multi_frame:
+            frames_data = self._analyze_all_frames(video_path, output_dir, context)
+            if not frames_data:
+                raise Exception("无法读取视频帧")
+        else:
+            # 读取视频第一帧
+            frame = context.frame
+            
+            # 处理这一帧的边缘检测
+            with tracer.span('edges.detect', 'edge') as span:
+                edges = detect_edge_points(frame)
+                span.set(edge_points=len(edges))
+            EDGE_POINTS.observe(len(edges))
+            FRAMES_KEPT.inc()
+            
+            # 保存原始帧图像
+            context.save_frame(frame_path)
+            
+            # 进行完整分析（包括直接分析和基于边缘的分析）
+            frames_data = [
                 {
                     "frame_id": 0,
                     "timestamp": 0,
-                    "edges": edges,
-                    "analysis": analysis_results
+                    "edges": edges_to_array(edges),
+                    "layout": self._extract_layout(frame),
+                    "analysis": self._combined_analysis(frame, edges, context.direct_analysis)
                 }
             ]
+        
+        # 边缘点以 int16 数组保存在 edges.npy 中，JSON 只保留引用
+        edges_path = f"{output_dir}/edges.npy"
+        with tracer.span('edges.save', 'io') as span:
+            edge_refs = save_edges([frame_data["edges"] for frame_data in frames_data], edges_path)
+            span.set(bytes=os.path.getsize(edges_path))
+        OUTPUT_BYTES.labels(kind='edges').inc(os.path.getsize(edges_path))
+        for frame_data, edge_ref in zip(frames_data, edge_refs):
+            frame_data["edges"] = edge_ref
+        
+        # 生成完整的JSON数据
+        json_data = {
+            "timestamp": datetime.now().isoformat(),
+            "frames": frames_data
         }
         
         # 保存JSON
-        json_str = json.dumps(json_data, indent=2)
         json_path = f"{output_dir}/edges.json"
-        with open(json_path, "w", encoding='utf-8') as f:
-            f.write(json_str)
+        with tracer.span('json.write', 'io', file='edges.json') as span:
+            json_str = json.dumps(json_data, indent=2)
+            with open(json_path, "w", encoding='utf-8') as f:
+                f.write(json_str)
+            span.set(bytes=len(json_str))
+        OUTPUT_BYTES.labels(kind='json').inc(len(json_str.encode('utf-8')))
         
         # 生成不同版本的HTML并保存
-        html_paths = self.generate_html(json_str)
+        html_paths = self.generate_html(json_str, output_dir)
 
         
         return {
             "frame_path": frame_path,
             "json_path": json_path,
+            "edges_path": edges_path,
             "html_paths": html_paths,
-            "analysis_results": analysis_results
+            "analysis_results": frames_data[0]["analysis"],
+            "frame_count": len(frames_data),
+            "dedup_stats": self.dedup_stats if multi_frame else {}
         }
+
+    def _analyze_all_frames(self, video_path, output_dir, context=None):
+        """分析所有采样帧，返回 edges.json 的 frames 数组"""
+        frames_dir = Path(output_dir) / 'frames'
+        frames_dir.mkdir(parents=True, exist_ok=True)
+        
+        frames_data = []
+        for frame_data in self.iter_frame_analysis(video_path, frames_dir=frames_dir, context=context):
+            # 图片路径相对于输出目录保存
+            image_path = Path(frame_data["image"])
+            frame_data["image"] = str(image_path.relative_to(output_dir))
+            # 第一帧同时保存为 frame.jpg，供生成的HTML引用
+            if frame_data["frame_id"] == 0:
+                shutil.copyfile(image_path, f"{output_dir}/frame.jpg")
+                OUTPUT_BYTES.labels(kind='image').inc(os.path.getsize(image_path))
+            frame_data["edges"] = edges_to_array(frame_data["edges"])
+            frames_data.append(frame_data)
+        return frames_data
     
 
-    def run_ablation(self, video_path, output_dir="output/ablation"):
-        """消融实验处理流程 - 仅使用视觉分析"""
+    def run_ablation(self, video_path, output_dir="output/ablation", context=None):
+        """消融实验处理流程 - 仅使用视觉分析
+
+        传入与 run 共享的 context 时复用已解码的帧和直接分析结果
+        """
+        context = context or RunContext(video_path, self.preprocessor)
         # 创建输出目录
         Path(output_dir).mkdir(parents=True, exist_ok=True)
         
-        # 读取视频第一帧
-        video = cv2.VideoCapture(video_path)
-        ret, frame = video.read()
-        video.release()
-        
-        if not ret:
-            raise Exception("无法读取视频帧")
-        
         # 保存原始帧图像
         frame_path = f"{output_dir}/frame.jpg"
-        cv2.imwrite(frame_path, frame)
+        context.save_frame(frame_path)
         
         # 直接进行图像理解（不进行边缘检测）
-        direct_analysis = self.preprocessor.direct_image_understanding(frame)
+        direct_analysis = context.direct_analysis()
         
         # 保存分析结果
         analysis_results = {
@@ -295,8 +633,10 @@ class WebpageHandler:
         
         # 保存分析结果为JSON
         analysis_path = f"{output_dir}/direct_analysis.json"
-        with open(analysis_path, "w", encoding='utf-8') as f:
-            json.dump(analysis_results, f, indent=2, ensure_ascii=False)
+        with tracer.span('json.write', 'io', file='direct_analysis.json'):
+            with open(analysis_path, "w", encoding='utf-8') as f:
+                json.dump(analysis_results, f, indent=2, ensure_ascii=False)
+        OUTPUT_BYTES.labels(kind='json').inc(os.path.getsize(analysis_path))
         
         # 生成HTML的提示词
         prompt = f"""
@@ -340,12 +680,15 @@ class WebpageHandler:
         Do not include any explanations or comments about the code.
         """
         
-        html_result = self.llm_util.native_chat(prompt)
-        
         # 保存HTML
         ablation_html_path = f"{output_dir}/index.html"
-        with open(ablation_html_path, "w", encoding='utf-8') as f:
-            f.write(html_result)
+        if self.stream:
+            self._stream_html('ablation', prompt, ablation_html_path)
+        else:
+            html_result = self._native_chat('ablation', prompt)
+            with open(ablation_html_path, "w", encoding='utf-8') as f:
+                f.write(html_result)
+            OUTPUT_BYTES.labels(kind='html').inc(len(html_result.encode('utf-8')))
         
         return {
             "frame_path": frame_path,
@@ -357,8 +700,7 @@ class WebpageHandler:
 
     def run_evaluate(self, ablation_html, full_html):
         """比较两个HTML版本的差异"""
-        evaluator = HTMLEvaluator()
-        report = evaluator.generate_report(ablation_html, full_html)
+        report = self.evaluator.generate_report(ablation_html, full_html)
         
         # 保存评估报告
         report_path = "output/evaluation_report.json"